@@ -0,0 +1,200 @@
+# api_scheduler.py — every Sheets and Drive call goes through one quota-aware scheduler
+#
+# All libraries synced in a run share the same per-minute Sheets quota, so a
+# single TokenBucket (from throttle.py) per quota — Sheets reads, Sheets
+# writes, Drive — meters every call in the process. Waiting callers are served
+# by priority (row writes before reads before Log-tab bookkeeping). A 429 or
+# 5xx is retried with the server's Retry-After when it sends one, otherwise
+# with throttle's jittered backoff; a 429 also pauses the whole quota so the
+# other threads stop hammering it. Calls that are not idempotent (appends,
+# inserts, file creation) are only retried on a 429, which guarantees nothing
+# was applied; after a 5xx or a dropped connection they may already have
+# landed, so they fail instead of being written twice.
+#
+# google_clients hands out ScheduledWorksheet handles, so upload, export,
+# the mirror and the write planner are covered without calling this directly.
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from gspread.exceptions import APIError
+from googleapiclient.errors import HttpError
+
+from instrumentation import count
+from throttle import TokenBucket, backoff_delay
+
+SHEETS_READS_PER_MIN = float(os.environ.get("SHEETS_READS_PER_MIN", "60"))
+SHEETS_WRITES_PER_MIN = float(os.environ.get("SHEETS_WRITES_PER_MIN", "60"))
+DRIVE_REQUESTS_PER_MIN = float(os.environ.get("DRIVE_REQUESTS_PER_MIN", "300"))
+API_BURST = int(os.environ.get("API_BURST", "10"))
+API_RETRY_MAX = int(os.environ.get("API_RETRY_MAX", "5"))
+API_RETRY_CAP_SECONDS = 64.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+PRIORITY_HIGH = 0       # row updates and appends
+PRIORITY_NORMAL = 1     # reads
+PRIORITY_LOW = 2        # Log tab, bookkeeping
+
+SHEETS_READ = "sheets_read"
+SHEETS_WRITE = "sheets_write"
+DRIVE = "drive"
+
+
+class QuotaLane:
+    """A token bucket whose waiters are admitted in priority order."""
+
+    def __init__(self, name, per_minute, burst=API_BURST):
+        self.name = name
+        self.bucket = TokenBucket(per_minute / 60.0, burst)
+        self.paused_until = 0.0
+        self._waiting = []
+        self._busy = False
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority):
+        """Block until this caller is first in line and a token is free; returns seconds waited."""
+        started = time.monotonic()
+        entry = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while self._busy or self._waiting[0] != entry:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._busy = True
+        try:
+            pause = self.paused_until - time.monotonic()
+            while pause > 0:
+                time.sleep(pause)
+                pause = self.paused_until - time.monotonic()
+            self.bucket.acquire()
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+        return time.monotonic() - started
+
+    def pause(self, seconds):
+        """Hold back every caller on this quota, e.g. after a 429."""
+        with self.bucket._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            # Empty, and refilling only from the end of the pause, so no burst fires the moment it lifts
+            self.bucket.tokens = 0.0
+            self.bucket.updated = self.paused_until
+
+
+def _status_and_retry_after(error):
+    if isinstance(error, APIError):
+        response = error.response
+        return response.status_code, response.headers.get("Retry-After")
+    if isinstance(error, HttpError):
+        return error.resp.status, error.resp.get("retry-after")
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return 503, None
+    return None, None
+
+
+def _retry_after_seconds(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiScheduler:
+    def __init__(self):
+        self.lanes = {
+            SHEETS_READ: QuotaLane(SHEETS_READ, SHEETS_READS_PER_MIN),
+            SHEETS_WRITE: QuotaLane(SHEETS_WRITE, SHEETS_WRITES_PER_MIN),
+            DRIVE: QuotaLane(DRIVE, DRIVE_REQUESTS_PER_MIN),
+        }
+
+    def call(self, lane, fn, *args, priority=None, label=None, retries=API_RETRY_MAX, idempotent=True, **kwargs):
+        """Run ``fn`` once a ``lane`` token is granted, retrying quota and server errors.
+
+        With ``idempotent=False`` only a 429 is retried.
+        """
+        quota = self.lanes[lane]
+        if priority is None:
+            priority = PRIORITY_HIGH if lane == SHEETS_WRITE else PRIORITY_NORMAL
+        label = label or getattr(fn, "__name__", lane)
+        attempt = 0
+        while True:
+            waited = quota.acquire(priority)
+            count("google_api.calls", lane=lane, call=label)
+            if waited > 0.05:
+                count("google_api.wait_seconds", round(waited, 3), lane=lane)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                status, retry_after = _status_and_retry_after(e)
+                retryable = status == 429 or (idempotent and status in RETRYABLE_STATUSES)
+                if not retryable or attempt >= retries:
+                    if status in RETRYABLE_STATUSES:
+                        count("google_api.gave_up", lane=lane, call=label, status=status)
+                    raise
+                delay = _retry_after_seconds(retry_after)
+                if delay is None:
+                    delay = backoff_delay(attempt, cap=API_RETRY_CAP_SECONDS)
+                if status == 429:
+                    quota.pause(delay)
+                count("google_api.retries", lane=lane, call=label, status=status)
+                print(f"⏳ {label}: HTTP {status}, retry {attempt + 1}/{retries} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def snapshot(self):
+        return {name: lane.bucket.snapshot() for name, lane in self.lanes.items()}
+
+
+scheduler = ApiScheduler()
+
+
+def api_call(lane, fn, *args, **kwargs):
+    return scheduler.call(lane, fn, *args, **kwargs)
+
+
+READ_METHODS = {"get_all_values", "get_all_records", "get_values", "row_values", "col_values", "batch_get", "acell", "cell"}
+WRITE_METHODS = {
+    "batch_update", "update", "update_cell", "update_cells", "append_row", "append_rows",
+    "add_cols", "add_rows", "hide_columns", "clear", "delete_rows", "insert_row", "insert_rows",
+}
+# Applying these twice changes the sheet twice
+NON_IDEMPOTENT_METHODS = {"append_row", "append_rows", "add_cols", "add_rows", "delete_rows", "insert_row", "insert_rows"}
+
+
+class ScheduledWorksheet:
+    """gspread Worksheet proxy whose API methods run through the scheduler."""
+
+    def __init__(self, worksheet, priority=None):
+        self.worksheet = worksheet
+        self.priority = priority
+
+    def with_priority(self, priority):
+        return ScheduledWorksheet(self.worksheet, priority)
+
+    def __getattr__(self, name):
+        attr = getattr(self.worksheet, name)
+        if name in READ_METHODS:
+            lane = SHEETS_READ
+        elif name in WRITE_METHODS:
+            lane = SHEETS_WRITE
+        else:
+            return attr
+
+        def _scheduled(*args, **kwargs):
+            return scheduler.call(lane, attr, *args, priority=self.priority, label=name,
+                                  idempotent=name not in NON_IDEMPOTENT_METHODS, **kwargs)
+
+        return _scheduled
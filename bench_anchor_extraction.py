@@ -0,0 +1,65 @@
+# bench_anchor_extraction.py — per-anchor locator loop vs. bulk in-page extraction
+#
+# Usage: python bench_anchor_extraction.py [facebook_debug.html | debug/<run>/<page>.html.gz] [rounds]
+# Loads the saved listing HTML into a local Chromium with all network blocked,
+# then times both link-harvest strategies on the same DOM.
+
+import gzip
+import sys
+import time
+from playwright.sync_api import sync_playwright
+from dom_extract import extract_event_links, absolute_facebook_link
+
+
+def legacy_extract_event_links(page):
+    links = set()
+    anchors = page.locator("a")
+    for i in range(anchors.count()):
+        href = anchors.nth(i).get_attribute("href")
+        if href and "/events/" in href and "/photos/" not in href:
+            links.add(absolute_facebook_link(href))
+    return links
+
+
+def _time(fn, page, rounds):
+    timings = []
+    result = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn(page)
+        timings.append(time.perf_counter() - started)
+    return result, min(timings), sum(timings) / len(timings)
+
+
+def main():
+    html_path = sys.argv[1] if len(sys.argv) > 1 else "facebook_debug.html"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    opener = gzip.open if html_path.endswith(".gz") else open
+    with opener(html_path, "rt", encoding="utf-8") as f:
+        html = f.read()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.route("**/*", lambda route: route.abort())
+        page.set_content(html, wait_until="domcontentloaded")
+        anchor_count = page.locator("a").count()
+        print(f"🧪 {html_path}: {anchor_count} anchors, {rounds} rounds")
+
+        legacy, legacy_best, legacy_avg = _time(legacy_extract_event_links, page, rounds)
+        bulk, bulk_best, bulk_avg = _time(extract_event_links, page, rounds)
+        browser.close()
+
+    print(f"🐢 locator loop : best {legacy_best * 1000:.1f} ms | avg {legacy_avg * 1000:.1f} ms | {len(legacy)} links")
+    print(f"⚡ bulk evaluate: best {bulk_best * 1000:.1f} ms | avg {bulk_avg * 1000:.1f} ms | {len(bulk)} links")
+    if bulk_best:
+        print(f"📈 speedup: {legacy_best / bulk_best:.1f}x")
+    if legacy != bulk:
+        print(f"❌ Link sets differ: {len(legacy ^ bulk)} mismatches")
+        sys.exit(1)
+    print("✅ Link sets match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# bench_categorizer.py — compiled keyword categorizer vs. the per-event dictionary loops
+#
+# Usage: python bench_categorizer.py [events] [seed]
+# Builds synthetic events from the real keyword tables plus filler text,
+# checks the compiled categorizer returns exactly the tags the original loops
+# did for every event, then reports events/second for both. A second pass
+# compares the full per-event category logic with the DataFrame batch API.
+
+import random
+import sys
+import time
+import pandas as pd
+from constants import LIBRARY_CONSTANTS, TITLE_KEYWORD_TO_CATEGORY, COMBINED_KEYWORD_TO_CATEGORY
+from categorizer import Categorizer, event_categories, categorize_frame
+from library_profile import get_library_profile
+
+FILLER = (
+    "join us at the library for a fun afternoon with friends and family bring a blanket "
+    "snacks provided registration required space is limited all ages welcome free parking"
+).split()
+
+
+def original_tags(title, description):
+    """The loops upload_events_to_sheet ran before the categorizer, deduplicated the same way."""
+    title_text = title.lower()
+    full_text = f"{title} {description}".lower()
+    title_based_tags = []
+    for keyword, cat in TITLE_KEYWORD_TO_CATEGORY.items():
+        if keyword.lower() in title_text:
+            title_based_tags.extend([c.strip() for c in cat.split(",")])
+    for (kw1, kw2), cat in COMBINED_KEYWORD_TO_CATEGORY.items():
+        if kw1.lower() in full_text and kw2.lower() in full_text:
+            title_based_tags.extend([c.strip() for c in cat.split(",")])
+    return list(dict.fromkeys(title_based_tags))
+
+
+def _phrase(rng, keywords, words):
+    parts = rng.sample(FILLER, words)
+    for _ in range(rng.randint(0, 3)):
+        keyword = rng.choice(keywords)
+        # Vary case and glue keywords to neighbours so substring matches get exercised
+        keyword = keyword.upper() if rng.random() < 0.2 else keyword.title() if rng.random() < 0.3 else keyword
+        parts.insert(rng.randint(0, len(parts)), keyword if rng.random() < 0.8 else keyword + "s")
+    return " ".join(parts)
+
+
+def make_events(n, seed=0):
+    rng = random.Random(seed)
+    keywords = list(TITLE_KEYWORD_TO_CATEGORY) + [kw for pair in COMBINED_KEYWORD_TO_CATEGORY for kw in pair]
+    return [(_phrase(rng, keywords, rng.randint(2, 6)), _phrase(rng, keywords, rng.randint(10, 25))) for _ in range(n)]
+
+
+def make_sheet_events(texts, library, seed=0):
+    rng = random.Random(seed)
+    constants = LIBRARY_CONSTANTS.get(library, {})
+    program_types = list(constants.get("program_type_to_categories", {})) + [""]
+    ages = list(constants.get("age_to_categories", {})) + ["", "Ages 3-5", "0-2", "13, 18", "Kids 5 to 12"]
+    locations = ["Norfolk Main", "Virginia Beach Central", "Suffolk / Hampton", "Somewhere", ""]
+    return [
+        {
+            "Event Name": title,
+            "Event Description": description,
+            "Program Type": rng.choice(program_types),
+            "Ages": rng.choice(ages),
+            "Location": rng.choice(locations),
+        }
+        for title, description in texts
+    ]
+
+
+def _frame_bench(texts, library):
+    profile = get_library_profile(library)
+    events = make_sheet_events(texts, library)
+
+    started = time.perf_counter()
+    expected = [event_categories(event, profile) for event in events]
+    loop_seconds = time.perf_counter() - started
+
+    df = pd.DataFrame(events)
+    started = time.perf_counter()
+    actual = categorize_frame(df, profile).tolist()
+    frame_seconds = time.perf_counter() - started
+
+    n = len(events)
+    mismatches = sum(1 for want, got in zip(expected, actual) if want != got)
+    print(f"📊 {library} per-event loop: {n / loop_seconds:,.0f} events/s ({loop_seconds:.2f}s)")
+    print(f"📊 {library} DataFrame:      {n / frame_seconds:,.0f} events/s ({frame_seconds:.2f}s, "
+          f"{loop_seconds / frame_seconds:.1f}x)")
+    return mismatches
+
+
+def _time(fn, events):
+    started = time.perf_counter()
+    results = [fn(title, description) for title, description in events]
+    return results, time.perf_counter() - started
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    events = make_events(n, seed)
+    print(f"🧪 {n} synthetic events, {len(TITLE_KEYWORD_TO_CATEGORY)} title keywords, "
+          f"{len(COMBINED_KEYWORD_TO_CATEGORY)} keyword pairs")
+
+    started = time.perf_counter()
+    categorizer = Categorizer()
+    print(f"🔧 Compiled categorizer in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    expected, loop_seconds = _time(original_tags, events)
+    actual, compiled_seconds = _time(categorizer.tags, events)
+    mismatches = [(events[i], expected[i], actual[i]) for i in range(n) if expected[i] != actual[i]]
+
+    print(f"📊 dictionary loops: {n / loop_seconds:,.0f} events/s ({loop_seconds:.2f}s)")
+    print(f"📊 compiled:         {n / compiled_seconds:,.0f} events/s ({compiled_seconds:.2f}s, "
+          f"{loop_seconds / compiled_seconds:.1f}x)")
+    print(f"🏷️ {sum(1 for tags in expected if tags)} events tagged")
+    if mismatches:
+        for event, want, got in mismatches[:5]:
+            print(f"❌ {event!r}\n   expected {want}\n   got      {got}")
+        print(f"❌ {len(mismatches)} mismatches")
+        sys.exit(1)
+    print("✅ Output identical for every event")
+
+    # Backfills repeat titles (recurring programs), so reuse a slice of the texts
+    recurring = [events[i % max(1, n // 20)] for i in range(n)]
+    frame_mismatches = sum(_frame_bench(recurring, library) for library in ("vbpl", "hpl", "chpl"))
+    if frame_mismatches:
+        print(f"❌ {frame_mismatches} DataFrame rows differ from the per-event loop")
+        sys.exit(1)
+    print("✅ DataFrame categories identical row for row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_event_parser.py — structured-data parser vs. body-text regexes
+#
+# Usage: python bench_event_parser.py [fixtures/events] [rounds]
+# Each <id>.html fixture has an <id>.json with the expected event dict.
+# Reports per-field accuracy and pages/second for both parsers.
+
+import json
+import os
+import sys
+import time
+from http_fetcher import parse_event_html
+from event_parser import EVENT_FIELDS
+
+
+def _load_corpus(directory):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".html"):
+            continue
+        key = name[:-len(".html")]
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            html = f.read()
+        with open(os.path.join(directory, f"{key}.json"), encoding="utf-8") as f:
+            expected = json.load(f)
+        corpus.append((key, html, expected))
+    return corpus
+
+
+def _run(corpus, structured, rounds):
+    correct = {field: 0 for field in EVENT_FIELDS}
+    misses = []
+    for key, html, expected in corpus:
+        event = parse_event_html(html, expected["link"], expected["city"], structured=structured)
+        for field in EVENT_FIELDS:
+            if event[field] == expected[field]:
+                correct[field] += 1
+            else:
+                misses.append((key, field, event[field], expected[field]))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for _, html, expected in corpus:
+            parse_event_html(html, expected["link"], expected["city"], structured=structured)
+    elapsed = time.perf_counter() - started
+    return correct, misses, rounds * len(corpus) / elapsed
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join("fixtures", "events")
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    corpus = _load_corpus(directory)
+    total = len(corpus) * len(EVENT_FIELDS)
+    print(f"🧪 {len(corpus)} fixtures from {directory}, {rounds} rounds")
+
+    failed = False
+    for label, structured in (("regex only", False), ("structured", True)):
+        correct, misses, throughput = _run(corpus, structured, rounds)
+        accuracy = sum(correct.values()) / total * 100
+        per_field = ", ".join(f"{field}={n}/{len(corpus)}" for field, n in correct.items())
+        print(f"\n📊 {label}: {accuracy:.1f}% fields correct, {throughput:.0f} pages/s")
+        print(f"   {per_field}")
+        for key, field, got, want in misses:
+            print(f"   ❌ {key}.{field}: got {got!r}, want {want!r}")
+        failed = failed or (structured and bool(misses))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
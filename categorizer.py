@@ -0,0 +1,213 @@
+# categorizer.py — keyword → category tags, compiled once from constants.py
+#
+# Replaces the per-event scans over TITLE_KEYWORD_TO_CATEGORY and
+# COMBINED_KEYWORD_TO_CATEGORY in upload_events_to_sheet. The title keywords are
+# compiled into a single trie-shaped regex that finds the longest keyword
+# starting at a position; keywords that are substrings of a found keyword are
+# implied and the scan resumes early enough to catch keywords overlapping it, so
+# the result is identical to running ``kw in text`` for every keyword. The few
+# distinct pair keywords stay plain substring checks over title + description.
+# Category strings are split once at compile time.
+
+import re
+import pandas as pd
+from constants import TITLE_KEYWORD_TO_CATEGORY, COMBINED_KEYWORD_TO_CATEGORY
+from library_profile import STRATEGY_PRESET, STRATEGY_PROGRAM_TYPES, STRATEGY_AGE_OVERRIDE, PPL_DEFAULT_CATEGORIES
+
+REGEX_MIN_KEYWORDS = 12
+FALLBACK_CITIES = ["Norfolk", "Virginia Beach", "Chesapeake", "Portsmouth", "Hampton", "Newport News", "Suffolk"]
+CATEGORY_INPUT_COLUMNS = ["Program Type", "Ages", "Categories", "Event Name", "Event Description", "Location"]
+
+
+def _trie_pattern(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def _build(node):
+        # Longer continuations first, so the match at a position is the longest keyword there
+        branches = [re.escape(char) + _build(child) for char, child in sorted(node.items()) if char]
+        if "" in node:
+            branches.append("")
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return _build(trie)
+
+
+class KeywordMatcher:
+    """Answers "which of these keywords occur in text" in one left-to-right regex scan."""
+
+    def __init__(self, keywords):
+        self.keywords = [k for k in dict.fromkeys(keywords) if k]
+        self.always = "" in keywords
+        # A handful of plain substring checks beats a regex scan (CPython's ``in`` is a fast search)
+        use_regex = len(self.keywords) >= REGEX_MIN_KEYWORDS
+        self._regex = re.compile(_trie_pattern(self.keywords)) if use_regex else None
+        # Finding keyword k implies every keyword that is a substring of k ...
+        self._implied = {k: frozenset(other for other in self.keywords if other in k) for k in self.keywords}
+        # ... so the scan only has to resume where a keyword could start inside k and run past its end
+        self._resume = {k: self._resume_offset(k) for k in self.keywords}
+
+    def _resume_offset(self, keyword):
+        for i in range(1, len(keyword)):
+            suffix = keyword[i:]
+            if any(len(other) > len(suffix) and other.startswith(suffix) for other in self.keywords):
+                return i
+        return len(keyword)
+
+    def present(self, text):
+        found = set()
+        if self.always:
+            found.add("")
+        if self._regex is None:
+            found.update(k for k in self.keywords if k in text)
+            return found
+        search = self._regex.search
+        match = search(text)
+        while match:
+            keyword = match.group()
+            found |= self._implied[keyword]
+            match = search(text, match.start() + self._resume[keyword])
+        return found
+
+
+class Categorizer:
+    def __init__(self, title_keywords=TITLE_KEYWORD_TO_CATEGORY, combined_keywords=COMBINED_KEYWORD_TO_CATEGORY):
+        self._title_rules = [(kw.lower(), tuple(c.strip() for c in cat.split(","))) for kw, cat in title_keywords.items()]
+        self._combined_rules = [
+            (kw1.lower(), kw2.lower(), tuple(c.strip() for c in cat.split(",")))
+            for (kw1, kw2), cat in combined_keywords.items()
+        ]
+        self._title_indices = {}
+        for i, (kw, _) in enumerate(self._title_rules):
+            self._title_indices.setdefault(kw, []).append(i)
+        self._title_matcher = KeywordMatcher([kw for kw, _ in self._title_rules])
+        self._combined_matcher = KeywordMatcher([kw for kw1, kw2, _ in self._combined_rules for kw in (kw1, kw2)])
+
+    def tags(self, title, description):
+        """Deduplicated keyword tags, in the order the original dictionary loops produced them."""
+        title_found = self._title_matcher.present(title.lower())
+        full_found = self._combined_matcher.present(f"{title} {description}".lower())
+        tags = []
+        for i in sorted(i for kw in title_found for i in self._title_indices[kw]):
+            tags.extend(self._title_rules[i][1])
+        for kw1, kw2, cats in self._combined_rules:
+            if kw1 in full_found and kw2 in full_found:
+                tags.extend(cats)
+        return list(dict.fromkeys(tags))
+
+
+DEFAULT_CATEGORIZER = Categorizer()
+
+
+def keyword_tags(title, description):
+    return DEFAULT_CATEGORIZER.tags(title, description)
+
+
+def base_categories(profile, program_type, ages_raw, preset=""):
+    """Program-type and age tags for one event under ``profile``, as (categories, age tags)."""
+    strategy = profile.strategy
+    if strategy == STRATEGY_PRESET:
+        # Use pre-tagged categories or fallback from scraper
+        categories = preset.strip() or PPL_DEFAULT_CATEGORIES
+        base = [c.strip() for c in categories.split(",") if c.strip()]
+    elif strategy == STRATEGY_PROGRAM_TYPES:
+        matched_tags = []
+        for pt in (pt.strip().lower() for pt in program_type.split(",") if pt.strip()):
+            matched_tags.extend(profile.program_type_categories.get(pt, ()))
+        base = [t for t in dict.fromkeys(matched_tags) if t]
+    else:
+        base = [t for t in profile.program_type_categories.get(program_type, ()) if t]
+
+    keyed_tags = []
+    if profile.age_categories:
+        for key in (a.strip() for a in ages_raw.split(",") if a.strip()):
+            keyed_tags.extend(profile.age_categories.get(key, ()))
+    if strategy == STRATEGY_AGE_OVERRIDE and keyed_tags:
+        base = [t for t in dict.fromkeys(keyed_tags) if t]
+
+    # Fuzzy age tags from the numbers in the Ages text
+    age_tags = []
+    nums = [int(n) for n in re.findall(r"\d+", ages_raw)]
+    if nums:
+        min_age, max_age = min(nums), max(nums)
+        if max_age <= 2:
+            age_tags.append("Audience - Toddler/Infant")
+        if max_age <= 4:
+            age_tags.append("Audience - Parent & Me")
+        if any(a in (3, 4) for a in nums):
+            age_tags.append("Audience - Preschool Age")
+        if max_age >= 5 and min_age <= 12:
+            age_tags.append("Audience - School Age")
+        if min_age >= 13:
+            age_tags.append("Audience - Teens")
+
+    all_tags = keyed_tags + age_tags
+    categories = ", ".join(dict.fromkeys(base + all_tags))
+    categories = categories.replace("\u00A0", " ").replace("Â", "").strip()
+    return categories, all_tags
+
+
+def fallback_categories(location):
+    raw_location = location.strip()
+    fallback_city = next((city for city in FALLBACK_CITIES if city in raw_location), "")
+    return f"Event Location - {fallback_city}, Audience - Free Event" if fallback_city else "Audience - Free Event"
+
+
+def combine_categories(categories, all_tags, title_tags, location):
+    tag_list = [c.strip() for c in categories.split(",") if c.strip()]
+    tag_list.extend(all_tags)
+    tag_list.extend(title_tags)
+    if not tag_list:
+        tag_list.append(fallback_categories(location))
+    return ", ".join(dict.fromkeys(tag_list))
+
+
+def event_categories(event, profile):
+    """The Categories cell upload_events_to_sheet writes for one scraped event."""
+    categories, all_tags = base_categories(
+        profile, event.get("Program Type", ""), event.get("Ages", ""), event.get("Categories", "")
+    )
+    title_tags = keyword_tags(event.get("Event Name", ""), event.get("Event Description", ""))
+    return combine_categories(categories, all_tags, title_tags, event.get("Location", ""))
+
+
+def categorize_frame(df, profile):
+    """Categories for every row of ``df``, row-for-row equal to event_categories.
+
+    Events repeat the same program type / ages and the same title / description
+    (recurring storytimes), so each distinct combination is computed once and
+    broadcast back; the city fallback is vectorized with ``str.contains``.
+    Missing columns and NaN cells count as empty strings, like ``event.get``.
+    """
+    frame = df.reindex(columns=CATEGORY_INPUT_COLUMNS).fillna("")
+    if frame.empty:
+        return pd.Series([], index=df.index, dtype=object, name="Categories")
+
+    preset = profile.strategy == STRATEGY_PRESET
+    base_keys = ["Program Type", "Ages"] + (["Categories"] if preset else [])
+    base = frame[base_keys].drop_duplicates()
+    base["_base"] = [
+        base_categories(profile, row[0], row[1], row[2] if preset else "") for row in base.itertuples(index=False)
+    ]
+    text = frame[["Event Name", "Event Description"]].drop_duplicates()
+    text["_title_tags"] = [keyword_tags(title, description) for title, description in text.itertuples(index=False)]
+    merged = frame.merge(base, on=base_keys, how="left").merge(text, on=["Event Name", "Event Description"], how="left")
+
+    fallback_city = pd.Series("", index=merged.index)
+    for city in reversed(FALLBACK_CITIES):
+        fallback_city = fallback_city.mask(merged["Location"].str.contains(city, regex=False), city)
+    fallback = ("Event Location - " + fallback_city + ", Audience - Free Event").where(fallback_city != "", "Audience - Free Event")
+
+    categories = []
+    for (base_text, all_tags), title_tags, fallback_text in zip(merged["_base"], merged["_title_tags"], fallback):
+        tag_list = [c.strip() for c in base_text.split(",") if c.strip()]
+        tag_list.extend(all_tags)
+        tag_list.extend(title_tags)
+        categories.append(", ".join(dict.fromkeys(tag_list or [fallback_text])))
+    return pd.Series(categories, index=df.index, dtype=object, name="Categories")
@@ -0,0 +1,113 @@
+# checkpoint.py — append-only per-listing journal so an interrupted run can resume
+#
+# Each listing gets checkpoints/<window>/<listing slug>.jsonl with one JSON
+# record per line:
+#     {"type": "links", "links": [...]}     harvested event links
+#     {"type": "event", "event": {...}}     a finished detail extraction
+#     {"type": "complete", "at": ts}        every link was processed (epoch seconds)
+# A restart in the same window (the cron day by default) reuses the harvested
+# links, re-emits finished events and only fetches what is still pending.
+# A completed journal is only trusted for CHECKPOINT_COMPLETE_MAX_AGE_MINUTES
+# (enough to resume a crashed run); after that the listing is scraped afresh.
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+CHECKPOINTS_ENABLED = os.environ.get("CHECKPOINTS", "1") == "1"
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", "checkpoints")
+CHECKPOINT_WINDOW = os.environ.get("CHECKPOINT_WINDOW") or datetime.now().strftime("%Y-%m-%d")
+CHECKPOINT_KEEP_DAYS = int(os.environ.get("CHECKPOINT_KEEP_DAYS", "2"))
+CHECKPOINT_COMPLETE_MAX_AGE_MINUTES = float(os.environ.get("CHECKPOINT_COMPLETE_MAX_AGE_MINUTES", "60"))
+
+
+def _slug(listing_url):
+    return re.sub(r"[^\w]+", "_", re.sub(r"^https?://(www\.)?", "", listing_url)).strip("_")[:80]
+
+
+class ListingJournal:
+    def __init__(self, listing_url, window=CHECKPOINT_WINDOW, directory=CHECKPOINT_DIR):
+        self.path = os.path.join(directory, window, f"{_slug(listing_url)}.jsonl")
+        self.links = None
+        self.events = {}
+        self.complete = False
+        self.completed_at = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by the crash; everything before it is still good
+                    break
+                if record["type"] == "links":
+                    self.links = record["links"]
+                elif record["type"] == "event":
+                    self.events[record["event"]["link"]] = record["event"]
+                elif record["type"] == "complete":
+                    self.complete = True
+                    self.completed_at = record.get("at", os.path.getmtime(self.path))
+
+    def _append(self, record):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_links(self, links):
+        self.links = sorted(links)
+        self._append({"type": "links", "links": self.links})
+
+    def record_event(self, event):
+        self.events[event["link"]] = event
+        self._append({"type": "event", "event": event})
+
+    def mark_complete(self):
+        self.complete = True
+        self.completed_at = time.time()
+        self._append({"type": "complete", "at": self.completed_at})
+
+    def reset(self):
+        """Forget everything recorded so far and start the listing over."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.links = None
+            self.events = {}
+            self.complete = False
+            self.completed_at = None
+
+
+def open_listing_journal(listing_url, max_complete_age_minutes=CHECKPOINT_COMPLETE_MAX_AGE_MINUTES):
+    if not CHECKPOINTS_ENABLED:
+        return None
+    journal = ListingJournal(listing_url)
+    if journal.complete and time.time() - journal.completed_at > max_complete_age_minutes * 60:
+        journal.reset()
+    return journal
+
+
+def cleanup_stale_journals(keep_days=CHECKPOINT_KEEP_DAYS, directory=CHECKPOINT_DIR, now=None):
+    """Remove journal windows older than ``keep_days``; returns how many were removed."""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = ((now or datetime.now()) - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+    removed = 0
+    for window in os.listdir(directory):
+        if window < cutoff and window != CHECKPOINT_WINDOW:
+            shutil.rmtree(os.path.join(directory, window), ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} stale checkpoint windows")
+    return removed
@@ -0,0 +1,75 @@
+# debug_capture.py — sampled, off-thread screenshot/HTML capture for listing pages
+#
+# Modes (DEBUG_CAPTURE): off, on-failure (default), sampled, always.
+# Only page.content()/page.screenshot() run on the browser thread; compression
+# and disk writes happen on a background writer so scraping is not held up.
+
+import gzip
+import os
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DEBUG_MODES = ("off", "on-failure", "sampled", "always")
+DEBUG_CAPTURE = os.environ.get("DEBUG_CAPTURE", "on-failure")
+DEBUG_SAMPLE_RATE = float(os.environ.get("DEBUG_SAMPLE_RATE", "0.1"))
+DEBUG_FULL_PAGE = os.environ.get("DEBUG_FULL_PAGE", "0") == "1"
+DEBUG_DIR = os.environ.get("DEBUG_DIR", "debug")
+RUN_ID = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-writer")
+_pending = []
+
+
+def should_capture(failed=False, mode=None):
+    mode = mode or DEBUG_CAPTURE
+    if mode not in DEBUG_MODES:
+        raise ValueError(f"Unknown debug capture mode: {mode}")
+    if mode == "always":
+        return True
+    if mode == "sampled":
+        return failed or random.random() < DEBUG_SAMPLE_RATE
+    if mode == "on-failure":
+        return failed
+    return False
+
+
+def _slug(text):
+    return re.sub(r"[^\w]+", "_", re.sub(r"^https?://(www\.)?", "", text)).strip("_")[:80]
+
+
+def _write(base_path, html, screenshot):
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    with gzip.open(f"{base_path}.html.gz", "wt", encoding="utf-8") as f:
+        f.write(html)
+    if screenshot:
+        with open(f"{base_path}.png", "wb") as f:
+            f.write(screenshot)
+    return base_path
+
+
+def capture_page(page, label, failed=False, mode=None):
+    """Snapshot ``page`` if the mode calls for it; returns the artifact base path or None."""
+    if not should_capture(failed, mode):
+        return None
+    base_path = os.path.join(DEBUG_DIR, RUN_ID, f"{_slug(label)}{'-failed' if failed else ''}")
+    try:
+        html = page.content()
+        screenshot = page.screenshot(full_page=DEBUG_FULL_PAGE)
+    except Exception as e:
+        print(f"⚠️ Debug capture failed for {label} → {e}")
+        return None
+    _pending.append(_writer.submit(_write, base_path, html, screenshot))
+    print(f"🔍 Queued debug capture → {base_path}")
+    return base_path
+
+
+def flush_debug_captures():
+    """Wait for queued artifacts to hit disk (call before the process exits)."""
+    while _pending:
+        future = _pending.pop()
+        try:
+            future.result()
+        except Exception as e:
+            print(f"⚠️ Failed to write debug artifact → {e}")
@@ -0,0 +1,154 @@
+# dom_extract.py — bulk DOM reads done in a single page.evaluate round trip
+
+EVENT_LINK_INCLUDE = "/events/"
+EVENT_LINK_EXCLUDE = "/photos/"
+
+_BULK_ATTRIBUTE_JS = """
+(elements, opts) => {
+    const seen = new Set();
+    const out = [];
+    for (const el of elements) {
+        const value = el.getAttribute(opts.attr);
+        if (!value) continue;
+        if (!opts.contains.every(s => value.includes(s))) continue;
+        if (opts.excludes.some(s => value.includes(s))) continue;
+        if (opts.unique) {
+            if (seen.has(value)) continue;
+            seen.add(value);
+        }
+        out.push(value);
+    }
+    return out;
+}
+"""
+
+
+def bulk_evaluate(page, selector, script, arg=None):
+    """Run ``script(elements, arg)`` over every match of ``selector`` inside the page.
+
+    One CDP round trip regardless of how many elements match, so use this for
+    any read that would otherwise loop over ``locator.nth(i)``.
+    """
+    return page.eval_on_selector_all(selector, script, arg)
+
+
+def bulk_attribute(page, selector, attr, contains=(), excludes=(), unique=True):
+    return bulk_evaluate(page, selector, _BULK_ATTRIBUTE_JS, {
+        "attr": attr,
+        "contains": list(contains),
+        "excludes": list(excludes),
+        "unique": unique,
+    })
+
+
+def absolute_facebook_link(href):
+    return href if href.startswith("http") else f"https://www.facebook.com{href}"
+
+
+def extract_event_links(page):
+    hrefs = bulk_attribute(
+        page, "a[href]", "href",
+        contains=(EVENT_LINK_INCLUDE,),
+        excludes=(EVENT_LINK_EXCLUDE,),
+    )
+    return {absolute_facebook_link(href) for href in hrefs}
+
+
+# === Event detail pages ===
+
+# Relay payloads can be hundreds of KB; only this much text around the event's
+# id (or the event marker) is sent back, which still covers its own fields.
+RELAY_WINDOW_CHARS = 20000
+LD_JSON_MAX_CHARS = 50000
+# Upper bounds on what the targeted node read can return
+DETAIL_MAX_LINES = 400
+DESCRIPTION_MAX_CHARS = 8000
+
+_STRUCTURED_SCRIPTS_JS = """
+(scripts, opts) => {
+    const out = [];
+    for (const s of scripts) {
+        const text = s.textContent || '';
+        if (s.type === 'application/ld+json') {
+            out.push(['ld+json', text.slice(0, opts.ldMax)]);
+            continue;
+        }
+        if (text.indexOf(opts.marker) < 0) continue;
+        // Anchor on the event's own id so a related event's fields don't fill the window
+        const at = text.indexOf(opts.anchor || opts.marker);
+        if (at < 0) continue;
+        out.push(['relay', text.slice(Math.max(0, at - opts.window), at + opts.window)]);
+    }
+    return out;
+}
+"""
+
+_EVENT_NODES_JS = """
+(opts) => {
+    const root = document.querySelector('[role="main"]') || document.body;
+    const heading = root.querySelector('h1, h2') || document.querySelector('h1, h2');
+    const lines = [];
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+    for (let n = walker.nextNode(); n && lines.length < opts.maxLines; n = walker.nextNode()) {
+        const t = n.nodeValue.trim();
+        if (t) lines.push(t);
+    }
+
+    const dateRe = new RegExp(opts.dateRe);
+    const timeRe = new RegExp(opts.timeRe, 'g');
+    const whenIdx = lines.findIndex(l => dateRe.test(l));
+    const dateMatch = whenIdx >= 0 ? lines[whenIdx].match(dateRe) : null;
+    const timeSource = whenIdx >= 0 ? lines.slice(whenIdx, whenIdx + 3) : lines;
+    const times = (timeSource.join(' ').match(timeRe) || []).slice(0, 2);
+
+    // Only look at lines after the date, and skip Facebook's "Location services are off" banner
+    let location = '';
+    const isLocation = l => /^Location\\b/.test(l) && !/^Location services\\b/i.test(l);
+    const locIdx = lines.findIndex((l, i) => i > whenIdx && isLocation(l));
+    if (locIdx >= 0) {
+        const next = lines[locIdx + 1] || '';
+        location = lines[locIdx].replace(/^Location\\s*/, '') || (/^Location services\\b/i.test(next) ? '' : next);
+    }
+
+    const description = [];
+    const detailsIdx = lines.findIndex(l => /^details$/i.test(l));
+    if (detailsIdx >= 0) {
+        let size = 0;
+        for (const l of lines.slice(detailsIdx + 1)) {
+            if (/^(Event by|Duration|Public)/i.test(l) || size > opts.maxDescription) break;
+            description.push(l);
+            size += l.length;
+        }
+    }
+
+    return {
+        title: heading ? heading.textContent : '',
+        date: dateMatch ? dateMatch[0] : '',
+        times: times,
+        location: location,
+        description: description.join('\\n').slice(0, opts.maxDescription),
+    };
+}
+"""
+
+
+def read_structured_scripts(page, marker, anchor=None):
+    return bulk_evaluate(page, "script", _STRUCTURED_SCRIPTS_JS, {
+        "marker": marker,
+        "anchor": anchor,
+        "window": RELAY_WINDOW_CHARS,
+        "ldMax": LD_JSON_MAX_CHARS,
+    })
+
+
+def extract_event_record(page, date_pattern, time_pattern):
+    """Read title, date/time, location and details from their nodes in one evaluation.
+
+    Only the matched strings leave the page, instead of the full body text.
+    """
+    return page.evaluate(_EVENT_NODES_JS, {
+        "dateRe": date_pattern,
+        "timeRe": time_pattern,
+        "maxLines": DETAIL_MAX_LINES,
+        "maxDescription": DESCRIPTION_MAX_CHARS,
+    })
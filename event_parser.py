@@ -0,0 +1,288 @@
+# event_parser.py — turn an event detail page into the scraper's event dict
+#
+# Structured data embedded in the page (ld+json, relay payloads) is read first;
+# the body-text regexes only fill fields the structured data did not provide.
+
+import json
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Plain pattern strings are shared with the in-page extractor (dom_extract)
+DATE_PATTERN = r"\w+,\s+\w+\s+\d{1,2}"
+TIME_PATTERN = r"\d{1,2}:\d{2}\s[APMapm]{2}"
+_DATE_RE = re.compile(DATE_PATTERN)
+_TIME_RE = re.compile(TIME_PATTERN)
+_LOCATION_RE = re.compile(r"Location(?!\s+[Ss]ervices\b)\s*([\w\s,]+)")
+_DETAILS_RE = re.compile(r"Details\s*(.*?)\n(?:Event by|Duration|Public)", re.DOTALL | re.IGNORECASE)
+
+
+def parse_event_text(title, raw_text, link, city):
+    date_match = _DATE_RE.search(raw_text)
+    time_match = _TIME_RE.findall(raw_text)
+    location = ""
+    match = _LOCATION_RE.search(raw_text)
+    if match:
+        location = match.group(1).strip()
+    elif "|" in title:
+        location = title.split("|")[-1].strip()
+
+    desc_match = _DETAILS_RE.search(raw_text)
+
+    return {
+        "title": title.strip(),
+        "date": date_match.group(0) if date_match else "",
+        "city": city,
+        "start_time": time_match[0] if time_match else "",
+        "end_time": time_match[1] if len(time_match) > 1 else "",
+        "location": location,
+        "description": desc_match.group(1).strip() if desc_match else "",
+        "link": link
+    }
+
+
+def event_from_record(record, link, city):
+    """Build the event dict from the compact record read by dom_extract.extract_event_record."""
+    title = record.get("title") or ""
+    times = record.get("times") or []
+    location = (record.get("location") or "").strip()
+    if not location and "|" in title:
+        location = title.split("|")[-1].strip()
+    return {
+        "title": title.strip(),
+        "date": record.get("date") or "",
+        "city": city,
+        "start_time": times[0] if times else "",
+        "end_time": times[1] if len(times) > 1 else "",
+        "location": location,
+        "description": (record.get("description") or "").strip(),
+        "link": link
+    }
+
+
+def is_complete(event):
+    return bool(event and event["title"] and event["date"] and event["start_time"])
+
+
+# === Structured data (ld+json / relay payloads) ===
+
+EVENT_TIMEZONE = ZoneInfo("America/New_York")
+EVENT_FIELDS = ("title", "date", "start_time", "end_time", "location", "description")
+
+_SCRIPT_RE = re.compile(r"<script([^>]*)>(.*?)</script>", re.DOTALL | re.IGNORECASE)
+_JSON_STRING = r'"((?:[^"\\]|\\.)*)"'
+_RELAY_START_RE = re.compile(r'"start_timestamp":(\d{9,11})')
+_RELAY_END_RE = re.compile(r'"end_timestamp":(\d{9,11})')
+_RELAY_TITLE_RE = re.compile(r'"__typename":"Event"(?:,"[^"]+":[^,{}]*)*?,"name":' + _JSON_STRING)
+_RELAY_PLACE_RE = re.compile(r'"event_place":\{[^{}]*?"name":' + _JSON_STRING)
+_RELAY_DESCRIPTION_RE = re.compile(r'"event_description":\{"text":' + _JSON_STRING)
+RELAY_MARKER = "start_timestamp"
+_EVENT_ID_RE = re.compile(r"/events/(\d+)")
+_JSON_DECODER = json.JSONDecoder()
+
+
+def event_id_from_link(link):
+    match = _EVENT_ID_RE.search(link or "")
+    return match.group(1) if match else None
+
+
+def relay_id_anchor(event_id):
+    """The text that marks the event's own object inside a relay payload."""
+    return f'"id":"{event_id}"'
+
+
+def _format_date(dt):
+    return f"{dt.strftime('%A')}, {dt.strftime('%B')} {dt.day}"
+
+
+def _format_time(dt):
+    return f"{dt.hour % 12 or 12}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
+
+
+def _local(dt):
+    return dt.astimezone(EVENT_TIMEZONE) if dt.tzinfo else dt
+
+
+def _parse_iso(value):
+    if not value:
+        return None
+    try:
+        return _local(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        return None
+
+
+def _decode_json_string(raw):
+    try:
+        return json.loads(f'"{raw}"')
+    except ValueError:
+        return raw
+
+
+def _iter_ld_objects(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_ld_objects(item)
+    elif isinstance(node, dict):
+        yield node
+        if "@graph" in node:
+            yield from _iter_ld_objects(node["@graph"])
+
+
+def _ld_location(location):
+    if isinstance(location, list):
+        location = location[0] if location else {}
+    if isinstance(location, str):
+        return location
+    if not isinstance(location, dict):
+        return ""
+    name = location.get("name", "")
+    if name:
+        return name
+    address = location.get("address", "")
+    if isinstance(address, dict):
+        return ", ".join(v for v in (address.get("streetAddress"), address.get("addressLocality")) if v)
+    return address or ""
+
+
+def _parse_ld_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    for obj in _iter_ld_objects(data):
+        types = obj.get("@type", "")
+        types = types if isinstance(types, list) else [types]
+        if not any(str(t).endswith("Event") for t in types):
+            continue
+        start = _parse_iso(obj.get("startDate"))
+        end = _parse_iso(obj.get("endDate"))
+        return {
+            "title": obj.get("name", ""),
+            "date": _format_date(start) if start else "",
+            "start_time": _format_time(start) if start else "",
+            "end_time": _format_time(end) if end else "",
+            "location": _ld_location(obj.get("location")),
+            "description": obj.get("description", ""),
+        }
+    return {}
+
+
+def _relay_objects(text, event_id):
+    """Yield every JSON object in ``text`` whose ``id`` is ``event_id``.
+
+    Relay payloads also carry related and suggested events, so only the object
+    that encloses the event's own id is read. Scripts may be cut to a window, so
+    each candidate ``{`` before the id is decoded on its own.
+    """
+    anchor = relay_id_anchor(event_id)
+    at = text.find(anchor)
+    while at >= 0:
+        brace = text.rfind("{", 0, at)
+        while brace >= 0:
+            try:
+                obj, end = _JSON_DECODER.raw_decode(text, brace)
+            except ValueError:
+                obj, end = None, -1
+            if end > at and isinstance(obj, dict) and str(obj.get("id")) == event_id:
+                yield obj
+                break
+            brace = text.rfind("{", 0, brace)
+        at = text.find(anchor, at + len(anchor))
+
+
+def _relay_fields(obj):
+    fields = {}
+    start = obj.get("start_timestamp")
+    if isinstance(start, int):
+        start = datetime.fromtimestamp(start, tz=EVENT_TIMEZONE)
+        fields["date"] = _format_date(start)
+        fields["start_time"] = _format_time(start)
+    end = obj.get("end_timestamp")
+    if isinstance(end, int):
+        fields["end_time"] = _format_time(datetime.fromtimestamp(end, tz=EVENT_TIMEZONE))
+    if isinstance(obj.get("name"), str):
+        fields["title"] = obj["name"]
+    place = obj.get("event_place")
+    if isinstance(place, dict) and isinstance(place.get("name"), str):
+        fields["location"] = place["name"]
+    description = obj.get("event_description")
+    if isinstance(description, dict) and isinstance(description.get("text"), str):
+        fields["description"] = description["text"]
+    return fields
+
+
+def _parse_relay(text, event_id=None):
+    if event_id:
+        fields = {}
+        for obj in _relay_objects(text, event_id):
+            for key, value in _relay_fields(obj).items():
+                fields.setdefault(key, value)
+        return fields
+
+    # No id in the link to anchor on: take the first event fields in the payload
+    start_match = _RELAY_START_RE.search(text)
+    if not start_match:
+        return {}
+    start = datetime.fromtimestamp(int(start_match.group(1)), tz=EVENT_TIMEZONE)
+    end_match = _RELAY_END_RE.search(text)
+    end = datetime.fromtimestamp(int(end_match.group(1)), tz=EVENT_TIMEZONE) if end_match else None
+    title = _RELAY_TITLE_RE.search(text)
+    place = _RELAY_PLACE_RE.search(text)
+    description = _RELAY_DESCRIPTION_RE.search(text)
+    return {
+        "title": _decode_json_string(title.group(1)) if title else "",
+        "date": _format_date(start),
+        "start_time": _format_time(start),
+        "end_time": _format_time(end) if end else "",
+        "location": _decode_json_string(place.group(1)) if place else "",
+        "description": _decode_json_string(description.group(1)) if description else "",
+    }
+
+
+def extract_structured_scripts(html):
+    """Pull only the ld+json and relay-payload script bodies out of a page."""
+    scripts = []
+    for attrs, body in _SCRIPT_RE.findall(html):
+        if "ld+json" in attrs.lower() or RELAY_MARKER in body:
+            scripts.append(("ld+json" if "ld+json" in attrs.lower() else "relay", body))
+    return scripts
+
+
+def parse_structured(scripts, event_id=None):
+    """Merge event fields from ld+json (preferred) and relay payload scripts.
+
+    With an ``event_id``, relay payloads are only read from that event's object.
+    """
+    fields = {}
+    for kind, body in sorted(scripts, key=lambda s: s[0] != "ld+json"):
+        parsed = _parse_ld_json(body) if kind == "ld+json" else _parse_relay(body, event_id)
+        for key, value in parsed.items():
+            if value and not fields.get(key):
+                fields[key] = value.strip()
+    return fields
+
+
+def merge_event(structured, fallback):
+    """Prefer structured fields, falling back to the regex result per field."""
+    event = dict(fallback)
+    for field in EVENT_FIELDS:
+        if structured.get(field):
+            event[field] = structured[field]
+    return event
+
+
+# Structured data alone is trusted when it covers these; otherwise read the text too
+STRUCTURED_REQUIRED_FIELDS = ("title", "date", "start_time", "location", "description")
+
+
+def parse_event(scripts, link, city, read_fallback):
+    """Build the event dict from structured scripts, reading the page only if needed.
+
+    ``read_fallback`` is a zero-argument callable returning the regex/DOM-based
+    event dict, so callers skip that work when structured data is complete.
+    """
+    structured = parse_structured(scripts, event_id_from_link(link))
+    if all(structured.get(f) for f in STRUCTURED_REQUIRED_FIELDS):
+        return merge_event(structured, parse_event_text("", "", link, city))
+    return merge_event(structured, read_fallback())
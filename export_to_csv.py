@@ -1,22 +1,27 @@
-import gspread
 import pandas as pd
 from datetime import datetime
 import base64
 import os
 import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import smtplib
 from email.mime.text import MIMEText
 import re
-from config import get_library_config
-from constants import LIBRARY_CONSTANTS
+from library_profile import get_library_profile
+from google_clients import get_worksheet, get_drive_service
+from api_scheduler import DRIVE, api_call
+from sheet_mirror import mirrored, records_with_status
+from sheet_writes import write_updates
 from gspread.utils import rowcol_to_a1
 import unicodedata
 from email.mime.base import MIMEBase
 from email import encoders
 from email.mime.multipart import MIMEMultipart
+from instrumentation import span, count
+
+# Export keeps its own case-sensitive " at ..." strip (the sheet upload's is case-insensitive)
+EXPORT_AT_CLAUSE_RE = re.compile(r"\s+at\s+.*")
+
 
 def send_notification_email_with_attachment(file_path, subject, recipient):
     smtp_user = os.environ["SMTP_USERNAME"]
@@ -36,9 +41,10 @@ def send_notification_email_with_attachment(file_path, subject, recipient):
         part.add_header("Content-Disposition", f"attachment; filename={os.path.basename(file_path)}")
         msg.attach(part)
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
+    with span("email.send", recipient=recipient, attachment=os.path.basename(file_path)):
+        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
+            server.login(smtp_user, smtp_pass)
+            server.send_message(msg)
 
     print(f"📧 Email with attachment sent to {recipient}")
 
@@ -87,10 +93,12 @@ def _ascii_quotes(val):
     return val.replace("’", "'").replace("‘", "'").replace("“", '"').replace("”", '"')
 
 def upload_csv_to_drive(csv_path, creds, folder_id):
-    drive_service = build("drive", "v3", credentials=creds)
+    drive_service = get_drive_service(creds)
     file_metadata = {"name": os.path.basename(csv_path), "parents": [folder_id]}
     media = MediaFileUpload(csv_path, mimetype="text/csv")
-    uploaded_file = drive_service.files().create(body=file_metadata, media_body=media, fields="id").execute()
+    with span("export.drive_upload", file=os.path.basename(csv_path)):
+        request = drive_service.files().create(body=file_metadata, media_body=media, fields="id")
+        uploaded_file = api_call(DRIVE, request.execute, label="drive.files.create", idempotent=False)
     file_id = uploaded_file.get("id")
     return f"https://drive.google.com/file/d/{file_id}/view"
 
@@ -103,30 +111,28 @@ def send_notification_email(file_url, subject, recipient):
     msg["From"] = smtp_user
     msg["To"] = recipient
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
+    with span("email.send", recipient=recipient):
+        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
+            server.login(smtp_user, smtp_pass)
+            server.send_message(msg)
 
     print(f"📬 Email sent to {recipient}")
 
 def export_events_to_csv(library="vbpl"):
-    config = get_library_config(library)
-    constants = LIBRARY_CONSTANTS.get(library, {})
-    name_suffix_map = constants.get("name_suffix_map", {})
-    suffix = config.get("event_name_suffix", "")
-
-    creds = service_account.Credentials.from_service_account_file(
-        "/etc/secrets/GOOGLE_APPLICATION_CREDENTIALS_JSON",
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-            "https://www.googleapis.com/auth/gmail.send"
-        ]
+    profile = get_library_profile(library)
+    config = profile.config
+    name_suffix_map = profile.name_suffix_map
+    suffix = profile.event_name_suffix
+
+    # Only "new" rows are read, from the mirror's status index; the "on site" marks go to both.
+    # The frame is indexed by sheet row number, which the marks below write back to.
+    sheet = mirrored(
+        get_worksheet(config["spreadsheet_name"], config["worksheet_name"]),
+        config["spreadsheet_name"], config["worksheet_name"],
     )
-
-    client = gspread.authorize(creds)
-    sheet = client.open(config["spreadsheet_name"]).worksheet(config["worksheet_name"])
-    df = pd.DataFrame(sheet.get_all_records())
+    with span("export.sheet_read", library=library, call="records_with_status"):
+        new_rows = records_with_status(sheet, "new")
+    df = pd.DataFrame([record for _, record in new_rows], index=[row for row, _ in new_rows])
 
     # 🔧 Convert all columns to string safely
     for col in df.columns:
@@ -223,20 +229,12 @@ def export_events_to_csv(library="vbpl"):
         if not str(row["Location"]).strip() else row["Location"], axis=1
     )
 
-    venue_map = constants.get("venue_names") or name_suffix_map
-
-    df["Venue"] = (
-        df["Location"]
-          .str.replace(r"^Library Branch:", "", regex=True)
-          .str.strip()
-          .map(venue_map)
-          .fillna(df["Location"].str.replace(r"^Library Branch:", "", regex=True).str.strip())
-    )
+    branch = df["Location"].str.replace(profile.branch_prefix_re, "", regex=True).str.strip()
+    df["Venue"] = branch.map(profile.venue_map).fillna(branch)
 
     def format_event_title(row):
-        base = re.sub(r"\s+at\s+.*", "", row["Event Name"]).strip()
-        loc_clean = re.sub(r"^Library Branch:", "", row["Location"]).strip()
-        suffix_name = name_suffix_map.get(loc_clean, loc_clean)
+        base = EXPORT_AT_CLAUSE_RE.sub("", row["Event Name"]).strip()
+        suffix_name = profile.display_location(row["Location"])
         return f"{base} at {suffix_name}{suffix}" if suffix_name else base + suffix
 
     df["Event Name"] = df.apply(format_event_title, axis=1)
@@ -288,39 +286,36 @@ def export_events_to_csv(library="vbpl"):
         export_df[col] = export_df[col].map(_ascii_normalize).map(_ascii_quotes)
 
 
-    csv_path = f"events_for_upload_{library}.csv"
-    export_df.to_csv(csv_path, index=False)
-    print(f"✅ Exported {len(export_df)} events to CSV (from {original_row_count} original rows)")
+    # ✅ Mark rows "on site" before the CSV goes out, by the row numbers they were read from;
+    # a row whose mark failed stays "new" and is left out, so it is exported next run instead of twice
+    site_sync_col = df.columns.get_loc("Site Sync Status")
 
-    send_notification_email_with_attachment(csv_path, config["email_subject"], config["email_recipient"])
+    def _mark(rows, status):
+        updates = [{"range": rowcol_to_a1(row_num, site_sync_col + 1), "values": [[status]]} for row_num in rows]
+        with span("export.batch_update", library=library, cells=len(updates)):
+            return write_updates(sheet, updates, label=f"{library} {status} marks")
 
-    # ✅ Mark exported rows as "on site" in the sheet
-    site_sync_col = df.columns.get_loc("Site Sync Status")
-    values = sheet.get_all_values()
-
-    # Build a map from Event Link → Sheet Row Number
-    link_col_idx = df.columns.get_loc("Event Link")
-    event_link_to_row = {}
-
-    for i, row in enumerate(values[1:], start=2):  # Skip header
-        if len(row) > link_col_idx:
-            link = row[link_col_idx].strip()
-            if link:
-                event_link_to_row[link] = i
-
-    # Prepare batch updates
-    updates = []
-    for link in df["Event Link"]:
-        link = str(link).strip()
-        row_num = event_link_to_row.get(link)
-
-        if row_num:
-            cell = rowcol_to_a1(row_num, site_sync_col + 1)
-            updates.append({"range": cell, "values": [["on site"]]})
-
-    # Perform batch update
-    if updates:
-        sheet.batch_update([{"range": u["range"], "values": u["values"]} for u in updates])
+    report = _mark(df.index, "on site")
+    if not report.ok:
+        export_df = export_df[~export_df.index.isin(report.failed_rows)]
+        print(f"⚠️ Left {len(df) - len(export_df)} events out of the export; their sheet rows could not be marked")
+        if export_df.empty:
+            raise RuntimeError(f"Could not mark any {library} rows as on site: {report.failures[0][1]}")
+
+    csv_path = f"events_for_upload_{library}.csv"
+    with span("export.csv_write", library=library, rows=len(export_df)):
+        export_df.to_csv(csv_path, index=False)
+    count("export.rows_exported", len(export_df), library=library)
+    print(f"✅ Exported {len(export_df)} events to CSV (from {original_row_count} rows marked new)")
+
+    try:
+        send_notification_email_with_attachment(csv_path, config["email_subject"], config["email_recipient"])
+    except Exception:
+        # Nothing went out, so hand the rows back to the next export
+        revert = _mark(export_df.index, "new")
+        if not revert.ok:
+            print(f"❌ {len(revert.failed_rows)} rows stay marked on site although the email failed")
+        raise
 
     return csv_path
 
@@ -0,0 +1,114 @@
+# google_clients.py — one process-wide cache of Google credentials, clients and handles
+#
+# connect_to_sheet used to re-read the service-account file, re-authorize
+# gspread and re-open the spreadsheet by name on every call (again just for
+# the Log tab), and export built its own credentials and Drive service. Here
+# each of those is built once per process and shared: the gspread client's
+# AuthorizedSession keeps its token and pooled HTTP connections, and
+# spreadsheets / worksheets are looked up by name only the first time.
+# The google.*_avoided counters show how many calls the cache saved.
+# Worksheets come back wrapped in api_scheduler.ScheduledWorksheet, so every
+# read and write on them is metered against the shared Sheets quota.
+
+import os
+import threading
+
+import gspread
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+from api_scheduler import SHEETS_READ, ScheduledWorksheet, api_call
+from instrumentation import count
+
+GOOGLE_CREDENTIALS_PATH = os.environ.get("GOOGLE_CREDENTIALS_PATH", "/etc/secrets/GOOGLE_APPLICATION_CREDENTIALS_JSON")
+GOOGLE_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/gmail.send",
+]
+
+_lock = threading.RLock()
+_credentials = None
+_client = None
+_drive_service = None
+_spreadsheets = {}
+_worksheets = {}
+CLIENT_STATS = {}
+
+
+def _note(name, avoided):
+    key = f"{name}_{'avoided' if avoided else 'calls'}"
+    CLIENT_STATS[key] = CLIENT_STATS.get(key, 0) + 1
+    count(f"google.{key}")
+
+
+def get_credentials():
+    global _credentials
+    with _lock:
+        _note("auth", _credentials is not None)
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_file(
+                GOOGLE_CREDENTIALS_PATH, scopes=GOOGLE_SCOPES
+            )
+        return _credentials
+
+
+def get_gspread_client():
+    global _client
+    with _lock:
+        _note("client", _client is not None)
+        if _client is None:
+            _client = gspread.authorize(get_credentials())
+        return _client
+
+
+# The lookups below run outside _lock: they can wait on the scheduler for a
+# while, and other threads' cache hits must not queue behind them. Two threads
+# missing at once may both look a name up; the first result is kept.
+
+def open_spreadsheet(spreadsheet_name):
+    with _lock:
+        spreadsheet = _spreadsheets.get(spreadsheet_name)
+        _note("open", spreadsheet is not None)
+    if spreadsheet is not None:
+        return spreadsheet
+    spreadsheet = api_call(SHEETS_READ, get_gspread_client().open, spreadsheet_name)
+    with _lock:
+        return _spreadsheets.setdefault(spreadsheet_name, spreadsheet)
+
+
+def get_worksheet(spreadsheet_name, worksheet_name):
+    key = (spreadsheet_name, worksheet_name)
+    with _lock:
+        worksheet = _worksheets.get(key)
+        _note("worksheet", worksheet is not None)
+    if worksheet is not None:
+        return worksheet
+    spreadsheet = open_spreadsheet(spreadsheet_name)
+    worksheet = ScheduledWorksheet(api_call(SHEETS_READ, spreadsheet.worksheet, worksheet_name))
+    with _lock:
+        return _worksheets.setdefault(key, worksheet)
+
+
+def get_drive_service(credentials=None):
+    """Drive v3 service on the shared credentials; other credentials get an uncached service."""
+    global _drive_service
+    if credentials is not None and credentials is not _credentials:
+        return build("drive", "v3", credentials=credentials, cache_discovery=False)
+    with _lock:
+        _note("drive", _drive_service is not None)
+        if _drive_service is None:
+            _drive_service = build("drive", "v3", credentials=get_credentials(), cache_discovery=False)
+        return _drive_service
+
+
+def forget_spreadsheet(spreadsheet_name):
+    """Drop cached handles after a spreadsheet or tab was renamed, deleted or recreated."""
+    with _lock:
+        _spreadsheets.pop(spreadsheet_name, None)
+        for key in [key for key in _worksheets if key[0] == spreadsheet_name]:
+            del _worksheets[key]
+
+
+def client_stats():
+    return dict(CLIENT_STATS)
@@ -0,0 +1,103 @@
+# http_fetcher.py — browserless-free fast path for event detail pages
+#
+# Tries to read an event's server-rendered HTML over plain HTTP and parse it
+# with bs4. Only events missing title, date or start time fall back to the
+# Playwright path. Transports are plain callables ``transport(url) -> (status, html)``
+# so the fetcher can run against saved fixtures offline.
+
+import os
+import re
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+from throttle import throttle_for
+from event_parser import parse_event, parse_event_text, extract_structured_scripts, is_complete, event_id_from_link
+
+HTTP_FAST_PATH = os.environ.get("HTTP_FAST_PATH", "1") == "1"
+HTTP_FETCH_WORKERS = int(os.environ.get("HTTP_FETCH_WORKERS", "8"))
+HTTP_FETCH_TIMEOUT = 15
+HTTP_USER_AGENT = os.environ.get(
+    "HTTP_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+)
+
+def _urlopen(url, timeout):
+    request = urllib.request.Request(url, headers={
+        "User-Agent": HTTP_USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml",
+        "Accept-Language": "en-US,en;q=0.9",
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            return response.status, response.read().decode(charset, errors="replace")
+    except urllib.error.HTTPError as e:
+        return e.code, ""
+
+
+def urllib_transport(url, timeout=HTTP_FETCH_TIMEOUT):
+    # Shares the host's rate limit and breaker with the browser path; 429/5xx are retried
+    return throttle_for(url).call(
+        _urlopen, url, timeout,
+        is_failure=lambda result: result[0] == 429 or result[0] >= 500,
+    )
+
+
+def fixture_key(url):
+    return event_id_from_link(url) or re.sub(r"[^\w]+", "_", url).strip("_")
+
+
+def fixture_transport(directory):
+    """Serve ``<directory>/<event id>.html`` for each event URL, 404 when missing."""
+    def _transport(url):
+        path = os.path.join(directory, f"{fixture_key(url)}.html")
+        if not os.path.exists(path):
+            return 404, ""
+        with open(path, encoding="utf-8") as f:
+            return 200, f.read()
+    return _transport
+
+
+def _read_html_text(html):
+    soup = BeautifulSoup(html, "html.parser")
+    og_title = soup.find("meta", attrs={"property": "og:title"})
+    heading = soup.find(["h1", "h2"])
+    if og_title and og_title.get("content"):
+        title = og_title["content"]
+    elif heading:
+        title = heading.get_text(" ", strip=True)
+    else:
+        title = soup.title.get_text(strip=True) if soup.title else ""
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    return title, soup.get_text("\n")
+
+
+def parse_event_html(html, link, city, structured=True):
+    scripts = extract_structured_scripts(html) if structured else []
+    return parse_event(scripts, link, city, lambda: parse_event_text(*_read_html_text(html), link, city))
+
+
+def fetch_event_fast(link, city, transport=urllib_transport):
+    try:
+        status, html = transport(link)
+    except Exception as e:
+        print(f"ℹ️ Fast path failed for {link} → {e}")
+        return None
+    if status != 200 or not html:
+        return None
+    event = parse_event_html(html, link, city)
+    return event if is_complete(event) else None
+
+
+def fetch_events_fast(links, city, transport=None, workers=HTTP_FETCH_WORKERS):
+    """Returns ``(events, fallback_links)``; fallback links still need a browser."""
+    transport = transport or urllib_transport
+    links = list(links)
+    if not links:
+        return [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(links)))) as pool:
+        parsed = list(pool.map(lambda link: fetch_event_fast(link, city, transport), links))
+    events = [event for event in parsed if event]
+    fallback_links = [link for link, event in zip(links, parsed) if not event]
+    return events, fallback_links
@@ -0,0 +1,130 @@
+# instrumentation.py — nested timed spans and counters for the scrape → upload → export pipeline
+#
+# Every finished span and counter update is written as one JSON line to
+# METRICS_PATH (set it empty to disable the file), and an aggregated summary
+# table is printed when the process exits. Lines are buffered in memory and
+# appended in batches, so hot counters do not open the file on every call.
+#
+#     with span("upload.batch_update", rows=len(update_requests)):
+#         sheet.batch_update(update_requests)
+#     count("upload.rows_updated", updated)
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_PATH = os.environ.get("METRICS_PATH", "metrics.jsonl")
+RUN_ID = datetime.now().strftime("%Y%m%d-%H%M%S")
+# Write buffered lines once this many have piled up or the oldest is this old
+METRICS_FLUSH_RECORDS = int(os.environ.get("METRICS_FLUSH_RECORDS", "500"))
+METRICS_FLUSH_SECONDS = 5.0
+
+_local = threading.local()
+_lock = threading.Lock()
+_span_totals = {}
+_counters = {}
+_pending = []
+_pending_since = None
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _emit(record):
+    global _pending_since
+    if not METRICS_PATH:
+        return
+    record = {"run_id": RUN_ID, "ts": datetime.now().isoformat(timespec="milliseconds"), **record}
+    line = json.dumps(record, default=str)
+    with _lock:
+        if not _pending:
+            _pending_since = time.monotonic()
+        _pending.append(line)
+        due = len(_pending) >= METRICS_FLUSH_RECORDS or time.monotonic() - _pending_since >= METRICS_FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def flush():
+    """Append every buffered metrics line to METRICS_PATH."""
+    with _lock:
+        if not _pending or not METRICS_PATH:
+            return
+        lines = "".join(line + "\n" for line in _pending)
+        _pending.clear()
+        with open(METRICS_PATH, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def record_span(name, seconds, ok=True, **attrs):
+    """Record a span timed elsewhere (e.g. pipelined detail pages) under the current parent."""
+    stack = _stack()
+    path = "/".join(stack + [name])
+    with _lock:
+        total = _span_totals.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0, "errors": 0})
+        total["count"] += 1
+        total["seconds"] += seconds
+        total["max"] = max(total["max"], seconds)
+        if not ok:
+            total["errors"] += 1
+    _emit({"type": "span", "name": name, "path": path, "seconds": round(seconds, 4),
+           "ok": ok, "thread": threading.current_thread().name, **attrs})
+
+
+@contextmanager
+def span(name, **attrs):
+    stack = _stack()
+    started = time.perf_counter()
+    stack.append(name)
+    ok = True
+    try:
+        yield attrs
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        stack.pop()
+        record_span(name, time.perf_counter() - started, ok=ok, **attrs)
+
+
+def count(name, amount=1, **attrs):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+    _emit({"type": "counter", "name": name, "amount": amount, **attrs})
+
+
+def snapshot():
+    with _lock:
+        return {
+            "spans": {name: dict(total) for name, total in _span_totals.items()},
+            "counters": dict(_counters),
+        }
+
+
+def print_summary():
+    data = snapshot()
+    if not data["spans"] and not data["counters"]:
+        flush()
+        return
+    print(f"\n📈 Run {RUN_ID} summary")
+    if data["spans"]:
+        print(f"{'span':<28}{'count':>7}{'total s':>10}{'avg s':>9}{'max s':>9}{'errors':>8}")
+        for name, t in sorted(data["spans"].items(), key=lambda kv: -kv[1]["seconds"]):
+            print(f"{name:<28}{t['count']:>7}{t['seconds']:>10.2f}{t['seconds'] / t['count']:>9.2f}"
+                  f"{t['max']:>9.2f}{t['errors']:>8}")
+    if data["counters"]:
+        print(f"\n{'counter':<36}{'value':>10}")
+        for name, value in sorted(data["counters"].items()):
+            print(f"{name:<36}{value:>10}")
+    _emit({"type": "summary", **data})
+    flush()
+
+
+atexit.register(print_summary)
@@ -0,0 +1,88 @@
+# library_profile.py — per-library settings compiled once from config.py and constants.py
+#
+# upload_to_sheets and export_to_csv used to re-read LIBRARY_CONSTANTS, re-split
+# category strings and recompile the title regexes for every event. A
+# LibraryProfile holds all of that pre-tokenized, plus the categorization
+# strategy, and get_library_profile caches one per library.
+
+import re
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Pattern, Tuple
+
+from config import get_library_config
+from constants import LIBRARY_CONSTANTS
+
+# How the program-type part of the categories is chosen
+STRATEGY_PRESET = "preset"                  # ppl: trust the scraper's Categories
+STRATEGY_PROGRAM_TYPES = "program_types"    # hpl: comma-separated, lower-cased program types
+STRATEGY_PROGRAM_TYPE = "program_type"      # default: one program type lookup
+STRATEGY_AGE_OVERRIDE = "age_override"      # chpl: age-keyed tags replace the program type tags
+
+LIBRARY_STRATEGIES = {"ppl": STRATEGY_PRESET, "hpl": STRATEGY_PROGRAM_TYPES, "chpl": STRATEGY_AGE_OVERRIDE}
+PPL_DEFAULT_CATEGORIES = "Audience - Family Event, Audience - Free Event, Audience - Preschool Age, Audience - School Age, Event Location - Portsmouth"
+
+
+def tokenize_categories(mapping):
+    """{key: "a, b"} → read-only {key: ("a", "b")}; keys with empty values are dropped, as the loops skipped them."""
+    return MappingProxyType({key: tuple(t.strip() for t in value.split(",")) for key, value in mapping.items() if value})
+
+
+@dataclass(frozen=True, slots=True)
+class LibraryProfile:
+    library: str
+    config: Mapping[str, str]
+    strategy: str
+    program_type_categories: Mapping[str, Tuple[str, ...]]
+    age_categories: Mapping[str, Tuple[str, ...]]
+    name_suffix_map: Mapping[str, str]
+    venue_map: Mapping[str, str]
+    default_categories: str
+    at_venue_re: Pattern = field(default=re.compile(r"\s*@\s*[^@,;:\\/]+", re.IGNORECASE))
+    at_clause_re: Pattern = field(default=re.compile(r"\s+at\s+.*", re.IGNORECASE))
+    branch_prefix_re: Pattern = field(default=re.compile(r"^Library Branch:"))
+
+    @property
+    def event_name_suffix(self):
+        return self.config.get("event_name_suffix", "")
+
+    def with_overrides(self, age_to_categories=None, name_suffix_map=None):
+        """A copy using caller-supplied age / branch-name tables (upload_events_to_sheet's keyword arguments)."""
+        changes = {}
+        if age_to_categories is not None:
+            changes["age_categories"] = tokenize_categories(age_to_categories)
+        if name_suffix_map is not None:
+            changes["name_suffix_map"] = MappingProxyType(dict(name_suffix_map))
+        return replace(self, **changes) if changes else self
+
+    def display_location(self, location):
+        loc_clean = self.branch_prefix_re.sub("", location).strip()
+        return self.name_suffix_map.get(loc_clean, loc_clean)
+
+    def sheet_event_name(self, name, location):
+        """Title as written to the sheet: "@ Branch" / "at ..." removed, then "at <branch><suffix>"."""
+        # Remove any "@ LibraryName" from event titles before suffixing
+        name_without_at = self.at_venue_re.sub("", name).strip()
+        name_cleaned = self.at_clause_re.sub("", name_without_at).strip()
+        display_loc = self.display_location(location)
+        if name_cleaned.lower().endswith(display_loc.lower()):
+            return f"{name_cleaned}{self.event_name_suffix}"
+        return f"{name_cleaned} at {display_loc}{self.event_name_suffix}"
+
+
+@lru_cache(maxsize=None)
+def get_library_profile(library):
+    config = get_library_config(library)
+    constants = LIBRARY_CONSTANTS.get(library, {})
+    name_suffix_map = constants.get("name_suffix_map", {})
+    return LibraryProfile(
+        library=library,
+        config=MappingProxyType(dict(config)),
+        strategy=LIBRARY_STRATEGIES.get(library, STRATEGY_PROGRAM_TYPE),
+        program_type_categories=tokenize_categories(constants.get("program_type_to_categories", {})),
+        age_categories=tokenize_categories(constants.get("age_to_categories", {})),
+        name_suffix_map=MappingProxyType(dict(name_suffix_map)),
+        venue_map=MappingProxyType(dict(constants.get("venue_names") or name_suffix_map)),
+        default_categories=f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
+    )
@@ -1,8 +1,16 @@
 from playwright.sync_api import sync_playwright
-import re
 from datetime import datetime
 import os
-from upload_to_sheets import upload_events_to_sheet
+import sys
+import json
+import resource
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+from upload_to_sheets import upload_events_to_sheet, stream_events_to_sheet
 from export_to_csv import send_notification_email_with_attachment
 from constants import (
     TITLE_KEYWORD_TO_CATEGORY,
@@ -11,6 +19,21 @@ from constants import (
     FACEBOOK_LOCATION_MAP
 )
 from googleapiclient.http import MediaFileUpload
+from dom_extract import EVENT_LINK_INCLUDE, extract_event_links, read_structured_scripts, extract_event_record
+from scroll_engine import scroll_listing, parse_listing_date
+from seen_events import SeenEventsStore
+from event_parser import (
+    parse_event, event_from_record, event_id_from_link, relay_id_anchor, RELAY_MARKER, DATE_PATTERN, TIME_PATTERN
+)
+from http_fetcher import HTTP_FAST_PATH, fetch_events_fast
+from debug_capture import capture_page, flush_debug_captures
+from session_state import load_storage_state, save_storage_state
+from throttle import RETRY_MAX, backoff_delay, throttle_for, print_throttle_summary
+from instrumentation import span, record_span, count
+from checkpoint import open_listing_journal, cleanup_stale_journals
+import replay
+from work_leases import LeaseStore
+from resource_blocking import install_resource_blocking, print_blocking_summary
 
 FB_PAGE_TO_CITY = {
     "facebook.com/VBParksRec": "Virginia Beach",
@@ -22,101 +45,505 @@ FB_PAGE_TO_CITY = {
     "facebook.com/ChesapeakePL": "Chesapeake",
 }
 
-def scrape_facebook_events(listing_url):
-    print(f"🌐 Scraping event listings from: {listing_url}")
-    city = next((val for key, val in FB_PAGE_TO_CITY.items() if key in listing_url), "Unknown")
+# Number of event detail tabs kept open per browser context
+DETAIL_CONCURRENCY = int(os.environ.get("DETAIL_CONCURRENCY", "4"))
+DETAIL_SETTLE_MS = 3000
+FIRST_LINK_TIMEOUT_MS = 15000
+# Number of parallel browserless connections used by scrape_all_listings
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "2"))
+FACEBOOK_PAGES_FILE = "facebook_pages.txt"
+# How long --shard-merge waits for the shard workers before uploading what it has
+SHARD_MERGE_TIMEOUT_SECONDS = float(os.environ.get("SHARD_MERGE_TIMEOUT_SECONDS", "7200"))
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
 
-    with sync_playwright() as p:
-        browser = p.chromium.connect_over_cdp(
-            f"wss://production-sfo.browserless.io?token={os.environ['BROWSERLESS_TOKEN']}"
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800}
+def _parse_event_detail(detail, link, city, payload_bytes=None):
+    event_id = event_id_from_link(link)
+    scripts = read_structured_scripts(detail, RELAY_MARKER, relay_id_anchor(event_id) if event_id else None)
+    records = []
+
+    def _read_fallback():
+        records.append(extract_event_record(detail, DATE_PATTERN, TIME_PATTERN))
+        return event_from_record(records[0], link, city)
+
+    event = parse_event(scripts, link, city, _read_fallback)
+    if payload_bytes is not None:
+        payload_bytes.append(sum(len(body) for _, body in scripts) + len(json.dumps(records)))
+    return event
+
+
+def _wait_for_detail(detail):
+    detail.wait_for_load_state("domcontentloaded", timeout=60000)
+    try:
+        # Wait for the heading instead of sleeping a fixed 3s on every page
+        detail.wait_for_selector("h1, h2", timeout=DETAIL_SETTLE_MS)
+    except Exception:
+        pass
+
+
+def fetch_event_details(context, links, city, concurrency=DETAIL_CONCURRENCY, latencies=None, payload_bytes=None):
+    return list(iter_event_details(context, links, city, concurrency, latencies, payload_bytes))
+
+
+def iter_event_details(context, links, city, concurrency=DETAIL_CONCURRENCY, latencies=None, payload_bytes=None):
+    """Visit event detail pages through a small pool of reusable tabs, yielding each event as it is parsed.
+
+    Up to ``concurrency`` navigations are started at once (``wait_until="commit"``)
+    so the browser loads them in parallel; each tab is parsed as soon as it is
+    ready and then refilled from the queue. Every navigation goes through the
+    host's throttle, and failed links are re-queued with backoff up to
+    RETRY_MAX times. Per-link timings are appended to ``latencies`` as
+    ``(link, seconds)`` and the characters read back from each page to
+    ``payload_bytes`` when lists are passed in.
+    """
+    queue = deque((link, 0) for link in links)
+    delayed = []
+    pool = [context.new_page() for _ in range(max(1, min(concurrency, len(queue))))]
+    idle = list(pool)
+    in_flight = deque()
+
+    def _record(link, started, ok):
+        elapsed = time.perf_counter() - started
+        if latencies is not None:
+            latencies.append((link, elapsed))
+        record_span("scrape.detail", elapsed, ok=ok, link=link)
+        print(f"⏱️ {elapsed:.2f}s → {link}")
+
+    def _failed(link, attempt, error):
+        throttle = throttle_for(link)
+        throttle.record_failure()
+        if attempt >= RETRY_MAX:
+            throttle.record_gave_up()
+            print(f"⚠️ Failed to load {link} → {error}")
+            return
+        delay = backoff_delay(attempt)
+        throttle.record_retry()
+        print(f"🔁 Retrying {link} in {delay:.1f}s → {error}")
+        delayed.append((time.monotonic() + delay, link, attempt + 1))
+
+    try:
+        while queue or in_flight or delayed:
+            now = time.monotonic()
+            for item in [d for d in delayed if d[0] <= now]:
+                delayed.remove(item)
+                queue.append(item[1:])
+
+            while idle and queue:
+                detail = idle.pop()
+                link, attempt = queue.popleft()
+                print(f"➡️ Visiting event: {link}")
+                throttle_for(link).before_request()
+                started = time.perf_counter()
+                try:
+                    detail.goto(link, timeout=60000, wait_until="commit")
+                    in_flight.append((detail, link, attempt, started))
+                except Exception as e:
+                    _record(link, started, ok=False)
+                    _failed(link, attempt, e)
+                    idle.append(detail)
+
+            if not in_flight:
+                if delayed and not queue:
+                    time.sleep(max(0.0, min(d[0] for d in delayed) - time.monotonic()))
+                continue
+
+            detail, link, attempt, started = in_flight.popleft()
+            event = None
+            try:
+                _wait_for_detail(detail)
+                event = _parse_event_detail(detail, link, city, payload_bytes)
+                throttle_for(link).record_success()
+            except Exception as e:
+                _failed(link, attempt, e)
+            finally:
+                _record(link, started, event is not None)
+                idle.append(detail)
+            if event is not None:
+                yield event
+    finally:
+        for detail in pool:
+            detail.close()
+
+
+def _print_latency_summary(latencies, payload_bytes=None):
+    if not latencies:
+        return
+    timings = sorted(seconds for _, seconds in latencies)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"📊 Detail pages: {len(timings)} | avg {sum(timings) / len(timings):.2f}s | "
+        f"p50 {timings[len(timings) // 2]:.2f}s | p95 {p95:.2f}s | max {timings[-1]:.2f}s"
+    )
+    if payload_bytes:
+        # ru_maxrss is reported in KB on Linux
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"📦 Read back {sum(payload_bytes) / len(payload_bytes) / 1024:.1f} KB/event "
+            f"(max {max(payload_bytes) / 1024:.1f} KB) | peak RSS {peak_rss_mb:.0f} MB"
         )
-        page = context.new_page()
-        page.goto(listing_url, timeout=90000)
+
+
+def _open_session(p):
+    browser = replay.open_browser(p)
+    storage_state = load_storage_state()
+    context = browser.new_context(
+        user_agent=USER_AGENT,
+        viewport={"width": 1280, "height": 800},
+        storage_state=storage_state
+    )
+    replay.attach_har(context)
+    install_resource_blocking(context)
+    print(f"🧭 Opened {'warm' if storage_state else 'cold'} browser context")
+    return browser, context
+
+
+def _close_session(browser, context):
+    if replay.SCRAPER_MODE != "replay":
+        save_storage_state(context)
+    # Closing the context is what flushes a recorded HAR to disk
+    context.close()
+    browser.close()
+
+
+def city_for_listing(listing_url):
+    return next((val for key, val in FB_PAGE_TO_CITY.items() if key in listing_url), "Unknown")
+
+
+def _scrape_listing(context, listing_url, detail_concurrency=DETAIL_CONCURRENCY, seen_store=None):
+    return list(iter_listing_events(context, listing_url, detail_concurrency, seen_store))
+
+
+def iter_listing_events(context, listing_url, detail_concurrency=DETAIL_CONCURRENCY, seen_store=None):
+    with span("scrape.listing", listing=listing_url):
+        yield from _iter_listing_events(context, listing_url, detail_concurrency, seen_store)
+
+
+def _harvest_listing_links(context, listing_url):
+    page = context.new_page()
+    try:
+        started = time.perf_counter()
+        with span("scrape.navigate", listing=listing_url):
+            throttle_for(listing_url).call(page.goto, listing_url, timeout=90000)
+            try:
+                page.wait_for_selector(f"a[href*='{EVENT_LINK_INCLUDE}']", timeout=FIRST_LINK_TIMEOUT_MS)
+                print(f"⏱️ First event link after {time.perf_counter() - started:.2f}s")
+            except Exception:
+                print(f"⏱️ No event link within {FIRST_LINK_TIMEOUT_MS / 1000:.0f}s")
 
         print("📜 Scrolling page to load all content...")
-        previous_height = 0
-        for _ in range(50):
-            current_height = page.evaluate("document.body.scrollHeight")
-            if current_height == previous_height:
-                break
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(4000)
-            previous_height = current_height
-        print("✅ Finished scrolling.")
-
-        # 🧼 Dismiss popup if visible
+        with span("scrape.scroll", listing=listing_url) as scroll_attrs:
+            scrolled_links, scroll_stats = scroll_listing(page)
+            scroll_attrs.update(steps=scroll_stats["steps"], stop_reason=scroll_stats["stop_reason"])
+        print(
+            f"✅ Finished scrolling: {scroll_stats['steps']} steps in {scroll_stats['seconds']}s "
+            f"({scroll_stats['stop_reason']}, {scroll_stats['links']} links)"
+        )
+
+        # 🧼 Dismiss popup if visible (rare once storage state is warm)
         try:
             popup = page.locator("div[role='dialog'] [aria-label='Close']")
             if popup.count() > 0:
                 print("❎ Dismissing login popup...")
                 popup.first.click()
-                page.wait_for_timeout(2000)
+                popup.first.wait_for(state="hidden", timeout=2000)
         except Exception as e:
             print(f"ℹ️ No popup found or failed to dismiss: {e}")
 
-        # 🔍 Save debug
-        page.screenshot(path="facebook_debug.png", full_page=True)
-        with open("facebook_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
+        # 🧭 Find event links in one in-page pass over all anchors
+        with span("scrape.harvest", listing=listing_url):
+            links = extract_event_links(page) | scrolled_links
 
-                # 🧭 Find event links using broader anchor search
-        links = set()
-        anchors = page.locator("a")
-        count = anchors.count()
-        print(f"🧪 Found {count} total anchors")
+        # 🔍 Save debug (a listing with no event links counts as a failure)
+        capture_page(page, listing_url, failed=not links)
+    except Exception:
+        capture_page(page, listing_url, failed=True)
+        raise
+    finally:
+        page.close()
 
-        for i in range(count):
-            try:
-                el = anchors.nth(i)
-                href = el.get_attribute("href")
-                if href and "/events/" in href and "/photos/" not in href:
-                    full_link = href if href.startswith("http") else f"https://www.facebook.com{href}"
-                    links.add(full_link)
-            except Exception as e:
-                print(f"⚠️ Anchor parse error: {e}")
+    return links
+
+
+def _iter_listing_events(context, listing_url, detail_concurrency, seen_store):
+    print(f"🌐 Scraping event listings from: {listing_url}")
+    city = city_for_listing(listing_url)
+    # Record/replay runs must really load every page, not resume from today's journal
+    journal = open_listing_journal(listing_url) if replay.is_live() else None
+
+    if journal and journal.complete:
+        print(f"⏯️ {listing_url} already finished in this window ({len(journal.events)} events)")
+        if seen_store is not None:
+            seen_store.record(journal.events.values())
+        yield from journal.events.values()
+        return
+
+    if journal and journal.links is not None:
+        links = set(journal.links)
+        print(f"⏯️ Reusing {len(links)} links harvested earlier in this window")
+    else:
+        links = _harvest_listing_links(context, listing_url)
+        if journal:
+            journal.record_links(links)
+
+    print(f"🔗 Found {len(links)} event links.")
+    count("scrape.links_found", len(links))
+    if journal and journal.events:
+        print(f"⏯️ Resuming: {len(journal.events)} events already extracted")
+        count("scrape.events_resumed", len(journal.events))
+        if seen_store is not None:
+            seen_store.record(journal.events.values())
+        yield from journal.events.values()
+        links = {link for link in links if link not in journal.events}
+
+    if seen_store is not None:
+        to_fetch = seen_store.links_to_fetch(links)
+        print(f"♻️ Skipping {len(links) - len(to_fetch)} known, unchanged events")
+        count("scrape.links_skipped_seen", len(links) - len(to_fetch))
+        links = to_fetch
+
+    parsed = 0
+    changed = 0
+
+    def _finished(event):
+        nonlocal parsed, changed
+        parsed += 1
+        if seen_store is not None:
+            changed += seen_store.record([event])
+        if journal:
+            journal.record_event(event)
+
+    if HTTP_FAST_PATH and replay.is_live() and links:
+        with span("scrape.fast_path", links=len(links)):
+            fast_events, links = fetch_events_fast(links, city)
+        count("scrape.events_fast_path", len(fast_events))
+        print(f"⚡ Fast path parsed {len(fast_events)} events, {len(links)} need the browser")
+        for event in fast_events:
+            _finished(event)
+            yield event
+
+    latencies = []
+    payload_bytes = []
+    for event in iter_event_details(
+        context, links, city, concurrency=detail_concurrency, latencies=latencies, payload_bytes=payload_bytes
+    ):
+        _finished(event)
+        yield event
+    _print_latency_summary(latencies, payload_bytes)
+    count("scrape.events_parsed", parsed)
+    if seen_store is not None:
+        print(f"🆕 {changed} of {parsed} fetched events are new or changed")
+    if journal:
+        journal.mark_complete()
+
+
+def scrape_facebook_events(listing_url, detail_concurrency=DETAIL_CONCURRENCY, seen_store=None):
+    """Scrape one listing page.
 
+    With a ``seen_store``, links already confirmed on the sheet are skipped; the
+    caller marks the returned events uploaded once they land and saves the store.
+    """
+    cleanup_stale_journals()
+    with sync_playwright() as p:
+        browser, context = _open_session(p)
+        try:
+            return _scrape_listing(context, listing_url, detail_concurrency=detail_concurrency, seen_store=seen_store)
+        finally:
+            _close_session(browser, context)
+            flush_debug_captures()
+            print_blocking_summary()
+            print_throttle_summary()
+
+
+def load_listing_urls(path=FACEBOOK_PAGES_FILE):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def scrape_all_listings(listing_urls=None, max_sessions=MAX_SESSIONS, detail_concurrency=DETAIL_CONCURRENCY, seen_store=None):
+    results = list(iter_all_listings(listing_urls, max_sessions, detail_concurrency, seen_store=seen_store))
+    print(f"📦 Scraped {len(results)} unique events")
+    return results
 
-        print(f"🔗 Found {len(links)} event links.")
-        results = []
 
-        for link in links:
-            print(f"➡️ Visiting event: {link}")
-            detail = context.new_page()
+def iter_all_listings(
+    listing_urls=None, max_sessions=MAX_SESSIONS, detail_concurrency=DETAIL_CONCURRENCY, lease_store=None, seen_store=None,
+):
+    """Scrape every listing page over a bounded pool of browserless sessions, yielding events as they are parsed.
+
+    Each worker thread owns one CDP connection and one context (the sync API is
+    per-thread) and keeps pulling listings from a shared queue until it is empty.
+    Events are merged by link, so an event cross-posted on two pages is yielded
+    once with the city of the first listing that returned it. With a ``seen_store``,
+    links already confirmed on the sheet are only re-fetched once their refresh
+    TTL expires or the event is close; the caller confirms uploads into the
+    store (``mark_uploaded``) and saves it.
+
+    With a ``lease_store`` the listings are claimed from the shared store instead
+    of a local queue, so several containers can split the work; a heartbeat
+    keeps each claimed lease alive until the listing is done, and every event
+    is also written to the store for the merge step.
+    """
+    if listing_urls is None:
+        listing_urls = load_listing_urls()
+    cleanup_stale_journals()
+
+    pending = Queue()
+    if lease_store is not None:
+        lease_store.seed(listing_urls)
+    else:
+        for url in listing_urls:
+            pending.put(url)
+
+    def _next_listing():
+        if lease_store is not None:
+            # Waits while other workers hold live leases, so a dead worker's listing is still picked up
+            return lease_store.claim_next()
+        try:
+            return pending.get_nowait()
+        except Empty:
+            return None
+
+    parsed = Queue()
+    seen_links = set()
+    lock = threading.Lock()
+
+    def _worker(worker_id):
+        with sync_playwright() as p:
             try:
-                detail.goto(link, timeout=60000)
-                detail.wait_for_timeout(3000)
-                title = detail.locator("h1, h2").first.text_content() or ""
-                raw_text = detail.inner_text("body")
-
-                date_match = re.search(r"\w+,\s+\w+\s+\d{1,2}", raw_text)
-                time_match = re.findall(r"\d{1,2}:\d{2}\s[APMapm]{2}", raw_text)
-                location = ""
-                match = re.search(r"Location\s*([\w\s,]+)", raw_text)
-                if match:
-                    location = match.group(1).strip()
-                elif "|" in title:
-                    location = title.split("|")[-1].strip()
-
-                desc_match = re.search(r"Details\s*(.*?)\n(?:Event by|Duration|Public)", raw_text, re.DOTALL | re.IGNORECASE)
-
-                results.append({
-                    "title": title.strip(),
-                    "date": date_match.group(0) if date_match else "",
-                    "city": city,
-                    "start_time": time_match[0] if time_match else "",
-                    "end_time": time_match[1] if len(time_match) > 1 else "",
-                    "location": location,
-                    "description": desc_match.group(1).strip() if desc_match else "",
-                    "link": link
-                })
+                browser, context = _open_session(p)
             except Exception as e:
-                print(f"⚠️ Failed to load {link} → {e}")
+                print(f"❌ Session {worker_id} failed to connect → {e}")
+                return
+            try:
+                while True:
+                    listing_url = _next_listing()
+                    if listing_url is None:
+                        break
+                    holding = lease_store.heartbeat(listing_url) if lease_store is not None else nullcontext()
+                    try:
+                        with holding as lease:
+                            for event in iter_listing_events(context, listing_url, detail_concurrency, seen_store):
+                                if lease is not None and lease.lost:
+                                    print(f"⚠️ Stopped scraping {listing_url}, its lease moved to another worker")
+                                    break
+                                if lease_store is not None:
+                                    lease_store.record_event(listing_url, event)
+                                with lock:
+                                    if event["link"] in seen_links:
+                                        continue
+                                    seen_links.add(event["link"])
+                                parsed.put(event)
+                            else:
+                                if lease_store is not None:
+                                    lease_store.complete(listing_url)
+                    except Exception as e:
+                        print(f"❌ Failed to scrape {listing_url} → {e}")
+                        if lease_store is not None:
+                            lease_store.release(listing_url)
             finally:
-                detail.close()
+                _close_session(browser, context)
+
+    workers = max(1, min(max_sessions, len(listing_urls)))
+    print(f"🚀 Scraping {len(listing_urls)} listings over {workers} browser sessions")
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = [pool.submit(_worker, worker_id) for worker_id in range(workers)]
+    try:
+        while True:
+            try:
+                yield parsed.get(timeout=0.5)
+            except Empty:
+                if all(f.done() for f in futures) and parsed.empty():
+                    break
+    finally:
+        pool.shutdown(wait=True)
+
+    if not pending.empty():
+        print(f"⚠️ {pending.qsize()} listings were not scraped (no live sessions)")
+    if lease_store is not None:
+        print(f"🧩 Shard progress: {lease_store.progress()}")
+
+    flush_debug_captures()
+    print_blocking_summary()
+    print_throttle_summary()
+
+
+def to_sheet_event(event):
+    """Map a scraped event onto the column names upload_events_to_sheet expects."""
+    event_date = parse_listing_date(event.get("date", ""))
+    times = " - ".join(t for t in (event.get("start_time"), event.get("end_time")) if t)
+    location = event.get("location", "")
+    return {
+        "Event Name": event.get("title", ""),
+        "Event Link": event.get("link", ""),
+        "Event Status": "",
+        "Time": times,
+        "Ages": "",
+        "Location": FACEBOOK_LOCATION_MAP.get(location, location),
+        "Month": event_date.strftime("%b") if event_date else "",
+        "Day": str(event_date.day) if event_date else "",
+        "Year": str(event_date.year) if event_date else "",
+        "Event Description": event.get("description", ""),
+        "Series": "",
+        "Program Type": "",
+        "Categories": "",
+    }
+
+
+def is_wanted(event):
+    title = event.get("title", "").lower()
+    return not any(keyword.lower() in title for keyword in UNWANTED_TITLE_KEYWORDS)
+
+
+def stream_all_listings_to_sheet(library="vbpl", listing_urls=None):
+    """Scrape and upload in one pass; only events confirmed on the sheet are skipped next time."""
+    seen_store = SeenEventsStore()
+
+    def _wanted_events():
+        for event in iter_all_listings(listing_urls, seen_store=seen_store):
+            if is_wanted(event):
+                yield to_sheet_event(event)
+            else:
+                # Filtered out on purpose, so there is nothing to wait for
+                seen_store.mark_uploaded([event["link"]])
+
+    try:
+        return stream_events_to_sheet(_wanted_events(), library=library, on_uploaded=seen_store.mark_uploaded)
+    finally:
+        seen_store.prune()
+        seen_store.save()
+
+
+def run_shard_worker(listing_urls=None):
+    """Claim listings from the shared lease store until none are left; events land in the store."""
+    lease_store = LeaseStore()
+    print(f"🧩 Shard worker {lease_store.worker_id} joining run {lease_store.run}")
+    # No local seen-events filtering: what gets merged must not depend on which container claimed a listing
+    scraped = sum(1 for _ in iter_all_listings(listing_urls, lease_store=lease_store))
+    print(f"🧩 Worker {lease_store.worker_id} scraped {scraped} events")
+    return scraped
+
+
+def merge_shards_to_sheet(library="vbpl", wait_timeout=SHARD_MERGE_TIMEOUT_SECONDS):
+    """Wait for every shard to finish, then upload the merged events once.
+
+    After ``wait_timeout`` seconds the events that did land are uploaded anyway.
+    """
+    lease_store = LeaseStore()
+    lease_store.wait_until_finished(timeout=wait_timeout)
+    events = lease_store.merged_events()
+    print(f"🧩 Merging {len(events)} events from {lease_store.progress()}")
+    return stream_events_to_sheet((to_sheet_event(e) for e in events if is_wanted(e)), library=library)
+
 
-        browser.close()
-        return results
+if __name__ == "__main__":
+    if "--shard-worker" in sys.argv:
+        run_shard_worker()
+    elif "--shard-merge" in sys.argv:
+        merge_shards_to_sheet()
+    elif "--scrape-only" in sys.argv:
+        # Dry run: scrape every listing and report counts without touching the sheet
+        events = scrape_all_listings()
+        for city in sorted({e["city"] for e in events}):
+            print(f"🏙️ {city}: {sum(1 for e in events if e['city'] == city)} events")
+    else:
+        # The daily cron runs plain `python main.py`, so the default is the full scrape → sheet pipeline
+        stream_all_listings_to_sheet()
@@ -0,0 +1,116 @@
+# replay.py — record Facebook traffic to a HAR and replay it offline
+#
+#   SCRAPER_MODE=live    browserless + live Facebook (default)
+#   SCRAPER_MODE=record  browserless + live Facebook, every response (facebook.com, fbcdn.net, ...) saved to REPLAY_HAR
+#   SCRAPER_MODE=replay  local Chromium, responses served from REPLAY_HAR, unknown URLs aborted
+#
+#   python replay.py record            # capture listings in facebook_pages.txt
+#   python replay.py replay [rounds]   # offline end-to-end run, compared with the recorded results
+#
+# The HTTP fast path and the checkpoint journals are bypassed in record/replay
+# so all traffic goes through the browser and ends up in (or comes from) the HAR.
+
+import json
+import os
+import sys
+import time
+
+SCRAPER_MODES = ("live", "record", "replay")
+SCRAPER_MODE = os.environ.get("SCRAPER_MODE", "live")
+REPLAY_DIR = os.environ.get("REPLAY_DIR", os.path.join("fixtures", "replay"))
+REPLAY_HAR = os.environ.get("REPLAY_HAR", os.path.join(REPLAY_DIR, "facebook.har"))
+REPLAY_EXPECTED = os.path.join(REPLAY_DIR, "expected_events.json")
+# Every host (fbcdn.net scripts included) so a replay never reaches the network
+REPLAY_URL_GLOB = "**/*"
+
+
+def is_live():
+    return SCRAPER_MODE == "live"
+
+
+def open_browser(p):
+    if SCRAPER_MODE not in SCRAPER_MODES:
+        raise ValueError(f"Unknown SCRAPER_MODE: {SCRAPER_MODE}")
+    if SCRAPER_MODE == "replay":
+        return p.chromium.launch()
+    return p.chromium.connect_over_cdp(
+        f"wss://production-sfo.browserless.io?token={os.environ['BROWSERLESS_TOKEN']}"
+    )
+
+
+def attach_har(context):
+    """Hook the HAR into ``context``; call before other routes so they take precedence."""
+    if SCRAPER_MODE == "record":
+        os.makedirs(os.path.dirname(REPLAY_HAR) or ".", exist_ok=True)
+        context.route_from_har(REPLAY_HAR, url=REPLAY_URL_GLOB, update=True, update_content="embed")
+        print(f"⏺️ Recording traffic to {REPLAY_HAR}")
+    elif SCRAPER_MODE == "replay":
+        if not os.path.exists(REPLAY_HAR):
+            raise FileNotFoundError(f"No recording at {REPLAY_HAR}; run `python replay.py record` first")
+        context.route_from_har(REPLAY_HAR, url=REPLAY_URL_GLOB, not_found="abort")
+        print(f"⏯️ Replaying traffic from {REPLAY_HAR}")
+
+
+def _comparable(events):
+    return sorted(events, key=lambda e: e["link"])
+
+
+def _record(listing_urls):
+    from main import scrape_all_listings
+    events = scrape_all_listings(listing_urls)
+    with open(REPLAY_EXPECTED, "w", encoding="utf-8") as f:
+        json.dump(_comparable(events), f, indent=2, ensure_ascii=False)
+    print(f"💾 Saved {len(events)} expected events to {REPLAY_EXPECTED}")
+
+
+def _replay(listing_urls, rounds):
+    import throttle
+    from main import scrape_all_listings
+
+    # Nothing to protect offline; don't let the rate limiter dominate timings
+    throttle.HOST_RATE_PER_SEC = 1000.0
+    throttle.HOST_BURST = 1000
+
+    with open(REPLAY_EXPECTED, encoding="utf-8") as f:
+        expected = json.load(f)
+
+    timings = []
+    events = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        events = scrape_all_listings(listing_urls)
+        timings.append(time.perf_counter() - started)
+
+    print(f"⏯️ Replay: best {min(timings):.2f}s | avg {sum(timings) / len(timings):.2f}s over {rounds} rounds")
+    got = _comparable(events)
+    if got != expected:
+        expected_by_link = {e["link"]: e for e in expected}
+        got_by_link = {e["link"]: e for e in got}
+        for link in sorted(set(expected_by_link) | set(got_by_link)):
+            if expected_by_link.get(link) != got_by_link.get(link):
+                print(f"❌ {link}\n   expected {expected_by_link.get(link)}\n   got      {got_by_link.get(link)}")
+        return False
+    print(f"✅ {len(got)} events match the recording")
+    return True
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "replay"
+    if command not in ("record", "replay"):
+        sys.exit("usage: python replay.py record | replay [rounds]")
+    # main.py imports `replay`, which is a different module object than this __main__
+    os.environ["SCRAPER_MODE"] = command
+    import replay
+    replay.SCRAPER_MODE = command
+
+    from main import load_listing_urls
+    listing_urls = load_listing_urls()
+    if command == "record":
+        _record(listing_urls)
+    else:
+        rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        sys.exit(0 if _replay(listing_urls, rounds) else 1)
+
+
+if __name__ == "__main__":
+    main()
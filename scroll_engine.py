@@ -0,0 +1,161 @@
+# scroll_engine.py — adaptive infinite scroll for Facebook event listings
+
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from dom_extract import bulk_evaluate, absolute_facebook_link, EVENT_LINK_INCLUDE, EVENT_LINK_EXCLUDE
+
+SCROLL_MAX_STEPS = 50
+# Stop once this many consecutive scrolls add no new event links
+SCROLL_PATIENCE = int(os.environ.get("SCROLL_PATIENCE", "3"))
+# DOM must stay quiet this long after a scroll before we look for new links
+SCROLL_QUIET_MS = 1200
+# Hard cap per scroll step when the page never settles
+SCROLL_STEP_TIMEOUT_MS = 8000
+# How long an empty step waits for pending requests (lazy loads) to finish
+SCROLL_NETWORK_IDLE_MS = 4000
+# Stop scrolling once listings reach this many days out (unset = no horizon)
+SCROLL_HORIZON_DAYS = os.environ.get("SCROLL_HORIZON_DAYS", "")
+
+_SCROLL_AND_SETTLE_JS = """
+async ({quietMs, maxMs}) => {
+    window.scrollTo(0, document.body.scrollHeight);
+    await new Promise(resolve => {
+        let quiet = null;
+        let hard = null;
+        const observer = new MutationObserver(() => {
+            clearTimeout(quiet);
+            quiet = setTimeout(done, quietMs);
+        });
+        function done() {
+            observer.disconnect();
+            clearTimeout(quiet);
+            clearTimeout(hard);
+            resolve();
+        }
+        observer.observe(document.body, {childList: true, subtree: true});
+        quiet = setTimeout(done, quietMs);
+        hard = setTimeout(done, maxMs);
+    });
+    return document.body.scrollHeight;
+}
+"""
+
+_EVENT_ANCHORS_JS = """
+(anchors, opts) => anchors
+    .map(a => [a.getAttribute('href') || '', a.innerText || ''])
+    .filter(([href]) => href.includes(opts.include) && !href.includes(opts.exclude))
+"""
+
+_LISTING_DATE_RE = re.compile(
+    r"\b(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)[a-z]*,?\s+"
+    r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+(\d{1,2})\b",
+    re.IGNORECASE,
+)
+
+
+def parse_listing_date(text, today=None):
+    """Parse the "Sat, Jul 12" style date Facebook shows on listing cards.
+
+    Listing cards carry no year, so a date more than 30 days in the past is
+    assumed to belong to next year.
+    """
+    match = _LISTING_DATE_RE.search(text or "")
+    if not match:
+        return None
+    today = today or date.today()
+    try:
+        parsed = datetime.strptime(f"{match.group(1).title()} {match.group(2)} {today.year}", "%b %d %Y").date()
+    except ValueError:
+        return None
+    if parsed < today - timedelta(days=30):
+        parsed = parsed.replace(year=today.year + 1)
+    return parsed
+
+
+def _default_horizon():
+    if not SCROLL_HORIZON_DAYS:
+        return None
+    return date.today() + timedelta(days=int(SCROLL_HORIZON_DAYS))
+
+
+def _read_event_anchors(page):
+    pairs = bulk_evaluate(page, "a[href]", _EVENT_ANCHORS_JS, {
+        "include": EVENT_LINK_INCLUDE,
+        "exclude": EVENT_LINK_EXCLUDE,
+    })
+    links = set()
+    latest = None
+    for href, text in pairs:
+        links.add(absolute_facebook_link(href))
+        parsed = parse_listing_date(text)
+        if parsed and (latest is None or parsed > latest):
+            latest = parsed
+    return links, latest
+
+
+def _wait_for_network_idle(page, timeout_ms):
+    """Give in-flight lazy loads a chance to land; returns False if requests were still pending."""
+    try:
+        page.wait_for_load_state("networkidle", timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def scroll_listing(page, max_steps=SCROLL_MAX_STEPS, patience=SCROLL_PATIENCE, horizon=None,
+                   quiet_ms=SCROLL_QUIET_MS, step_timeout_ms=SCROLL_STEP_TIMEOUT_MS,
+                   network_idle_ms=SCROLL_NETWORK_IDLE_MS):
+    """Scroll until the listing stops yielding new event links.
+
+    Each step scrolls to the bottom and waits for DOM mutations to go quiet
+    instead of sleeping a fixed time. A step that finds nothing new first waits
+    for the network to go idle and looks again, so a slow lazy load is not
+    mistaken for the end of the list. Scrolling stops when ``patience``
+    consecutive steps add no event links, when the furthest listed date passes
+    ``horizon``, or after ``max_steps``. Returns ``(links, stats)``.
+    """
+    if horizon is None:
+        horizon = _default_horizon()
+
+    started = time.perf_counter()
+    links, latest = _read_event_anchors(page)
+    steps = 0
+    idle_steps = 0
+    stop_reason = "max_steps"
+
+    while steps < max_steps:
+        if horizon and latest and latest > horizon:
+            stop_reason = "horizon"
+            break
+
+        page.evaluate(_SCROLL_AND_SETTLE_JS, {"quietMs": quiet_ms, "maxMs": step_timeout_ms})
+        steps += 1
+
+        found, latest_found = _read_event_anchors(page)
+        if not found - links:
+            _wait_for_network_idle(page, network_idle_ms)
+            found, latest_found = _read_event_anchors(page)
+        new_links = found - links
+        links |= found
+        if latest_found and (latest is None or latest_found > latest):
+            latest = latest_found
+
+        if new_links:
+            idle_steps = 0
+        else:
+            idle_steps += 1
+            if idle_steps >= patience:
+                stop_reason = "no_new_links"
+                break
+
+    stats = {
+        "steps": steps,
+        "seconds": round(time.perf_counter() - started, 2),
+        "links": len(links),
+        "latest_date": latest.isoformat() if latest else "",
+        "stop_reason": stop_reason,
+    }
+    return links, stats
@@ -0,0 +1,103 @@
+# seen_events.py — persistent store of already-scraped event links
+#
+# Keyed by event link, each entry keeps when the detail page was last scraped,
+# a fingerprint of the parsed fields and the event date, so unchanged events
+# can be skipped on the next run. An entry only counts once mark_uploaded()
+# confirms the event reached the sheet; until then the link is fetched again.
+# Point SEEN_EVENTS_PATH at a persistent disk when running in a container.
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from scroll_engine import parse_listing_date
+
+SEEN_EVENTS_PATH = os.environ.get("SEEN_EVENTS_PATH", "seen_events.json")
+# Re-scrape known events at least this often
+REFRESH_TTL_HOURS = int(os.environ.get("SEEN_EVENTS_TTL_HOURS", "168"))
+# Always re-scrape events happening within this many days (late cancellations, time changes)
+NEAR_EVENT_DAYS = int(os.environ.get("SEEN_EVENTS_NEAR_DAYS", "3"))
+# Forget events this long after they happened
+PRUNE_AFTER_DAYS = 30
+
+FINGERPRINT_FIELDS = ("title", "date", "start_time", "end_time", "location", "description")
+
+
+def event_fingerprint(event):
+    payload = json.dumps([event.get(f, "") for f in FINGERPRINT_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SeenEventsStore:
+    def __init__(self, path=SEEN_EVENTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not read {path}, starting empty → {e}")
+
+    def needs_refresh(self, link, now=None):
+        entry = self.entries.get(link)
+        if not entry or not entry.get("uploaded"):
+            return True
+        now = now or datetime.now()
+        last_scraped = datetime.fromisoformat(entry["last_scraped"])
+        if now - last_scraped >= timedelta(hours=REFRESH_TTL_HOURS):
+            return True
+        if entry.get("event_date"):
+            days_out = (datetime.fromisoformat(entry["event_date"]).date() - now.date()).days
+            if 0 <= days_out <= NEAR_EVENT_DAYS:
+                return True
+        return False
+
+    def links_to_fetch(self, links, now=None):
+        with self._lock:
+            return [link for link in links if self.needs_refresh(link, now)]
+
+    def record(self, events, now=None):
+        """Store freshly parsed events; returns how many were new or changed."""
+        now = now or datetime.now()
+        changed = 0
+        with self._lock:
+            for event in events:
+                fingerprint = event_fingerprint(event)
+                previous = self.entries.get(event["link"])
+                unchanged = previous and previous["fingerprint"] == fingerprint
+                if not unchanged:
+                    changed += 1
+                event_date = parse_listing_date(event.get("date", ""), now.date())
+                self.entries[event["link"]] = {
+                    "last_scraped": now.isoformat(timespec="seconds"),
+                    "fingerprint": fingerprint,
+                    "event_date": event_date.isoformat() if event_date else "",
+                    "uploaded": bool(unchanged and previous.get("uploaded")),
+                }
+        return changed
+
+    def mark_uploaded(self, links):
+        """Confirm these links are on the sheet, so later runs may skip them."""
+        with self._lock:
+            for link in links:
+                if link in self.entries:
+                    self.entries[link]["uploaded"] = True
+
+    def prune(self, now=None):
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=PRUNE_AFTER_DAYS)).date().isoformat()
+        with self._lock:
+            stale = [link for link, e in self.entries.items() if e.get("event_date") and e["event_date"] < cutoff]
+            for link in stale:
+                del self.entries[link]
+        return len(stale)
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
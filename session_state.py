@@ -0,0 +1,36 @@
+# session_state.py — persist Playwright storage state (cookies, localStorage) between runs
+#
+# The first run starts from the checked-in auth.json; every session saves its
+# state back on close, so later runs open already-warm contexts and rarely see
+# Facebook's login dialog.
+
+import json
+import os
+import threading
+
+STORAGE_STATE_PATH = os.environ.get("STORAGE_STATE_PATH", "storage_state.json")
+SEED_STORAGE_STATE_PATH = "auth.json"
+
+_lock = threading.Lock()
+
+
+def load_storage_state():
+    """Path to pass as ``new_context(storage_state=...)``, or None for a cold context."""
+    for path in (STORAGE_STATE_PATH, SEED_STORAGE_STATE_PATH):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def save_storage_state(context, path=STORAGE_STATE_PATH):
+    try:
+        state = context.storage_state()
+    except Exception as e:
+        print(f"⚠️ Could not read storage state → {e}")
+        return
+    with _lock:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    print(f"🍪 Saved {len(state.get('cookies', []))} cookies to {path}")
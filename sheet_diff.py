@@ -0,0 +1,120 @@
+# sheet_diff.py — change detection for the Raw Events tab without reading every row
+#
+# Each row carries a fingerprint of its 13 core cells (A–M, stripped) in a
+# "Row Fingerprint" column after the status columns. An upload reads only the
+# header row plus the link (B) and fingerprint columns, then fetches full rows
+# just for links whose fingerprint differs from the freshly built core (or
+# that have none yet — those get one written so later runs can skip them).
+# The fingerprint is of what the uploader last wrote, so a hand edit to A–M is
+# kept until the scraped content itself changes (the full-tab read used to
+# overwrite it on the next run); N–P never took part in the comparison.
+
+import hashlib
+from gspread.utils import rowcol_to_a1
+
+FINGERPRINT_HEADER = "Row Fingerprint"
+ROW_WIDTH = 16              # A–M core, N last scraped, O status, P site sync
+ROW_FETCH_CHUNK = 100       # ranges per values.batchGet request
+
+
+def row_fingerprint(core):
+    return hashlib.blake2b("\x1f".join(core).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def column_letter(col):
+    return rowcol_to_a1(1, col)[:-1]
+
+
+class SheetIndex:
+    """Row numbers and stored fingerprints by link, read through column-projected ranges."""
+
+    def __init__(self, headers, link_rows, fingerprints, fingerprint_col, header_missing):
+        self.headers = headers
+        self.link_rows = link_rows
+        self.fingerprints = fingerprints
+        self.fingerprint_col = fingerprint_col
+        self.fingerprint_letter = column_letter(fingerprint_col)
+        self.header_missing = header_missing
+        # Set when appended rows could not be placed; the next batch re-reads the index
+        self.stale = False
+
+    def is_unchanged(self, link, core):
+        stored = self.fingerprints.get(link)
+        return stored is not None and stored == row_fingerprint(core)
+
+    def record_fingerprint(self, link, core):
+        self.fingerprints[link] = row_fingerprint(core)
+
+    def record_row(self, link, row_index, core):
+        """Note where an appended row landed (``None`` when the append response didn't say)."""
+        if row_index is None:
+            self.stale = True
+            return
+        self.link_rows[link] = row_index
+        self.record_fingerprint(link, core)
+
+    def fingerprint_update(self, row_index, core):
+        return {"range": f"{self.fingerprint_letter}{row_index}", "values": [[row_fingerprint(core)]]}
+
+    def header_update(self):
+        return {"range": f"{self.fingerprint_letter}1", "values": [[FINGERPRINT_HEADER]]}
+
+    def append_row(self, full_row, core):
+        """Pad a new A–P row out to the fingerprint column and fill it in."""
+        padding = [""] * (self.fingerprint_col - 1 - len(full_row))
+        return full_row + padding + [row_fingerprint(core)]
+
+
+def _column_values(value_range):
+    return [row[0] if row else "" for row in value_range]
+
+
+def read_sheet_index(sheet, clean_link):
+    headers = sheet.row_values(1)
+    if FINGERPRINT_HEADER in headers:
+        fingerprint_col = headers.index(FINGERPRINT_HEADER) + 1
+        header_missing = False
+    else:
+        fingerprint_col = max(len(headers), ROW_WIDTH) + 1
+        header_missing = True
+
+    letter = column_letter(fingerprint_col)
+    ranges = ["B2:B"] + ([] if header_missing else [f"{letter}2:{letter}"])
+    value_ranges = sheet.batch_get(ranges)
+    links = _column_values(value_ranges[0])
+    fingerprints = _column_values(value_ranges[1]) if not header_missing else []
+
+    link_rows = {}
+    stored = {}
+    for i, raw_link in enumerate(links):
+        # Later duplicates win, as they did when the whole tab was read
+        link = clean_link(raw_link.strip())
+        link_rows[link] = i + 2
+        stored[link] = fingerprints[i] if i < len(fingerprints) and fingerprints[i] else None
+    return SheetIndex(headers, link_rows, stored, fingerprint_col, header_missing)
+
+
+def ensure_fingerprint_column(sheet, index):
+    """Make room for (and hide) a new fingerprint column; the header itself goes out with the batch update."""
+    if not index.header_missing:
+        return
+    if index.fingerprint_col > sheet.col_count:
+        sheet.add_cols(index.fingerprint_col - sheet.col_count)
+    try:
+        sheet.hide_columns(index.fingerprint_col - 1, index.fingerprint_col)
+    except Exception as e:
+        print(f"ℹ️ Could not hide {FINGERPRINT_HEADER} column: {e}")
+
+
+def fetch_rows(sheet, row_indexes, width=ROW_WIDTH):
+    """Full A–P contents for just these rows, padded to ``width``."""
+    last = column_letter(width)
+    rows = sorted(row_indexes)
+    fetched = {}
+    for start in range(0, len(rows), ROW_FETCH_CHUNK):
+        chunk = rows[start:start + ROW_FETCH_CHUNK]
+        value_ranges = sheet.batch_get([f"A{r}:{last}{r}" for r in chunk])
+        for row_index, value_range in zip(chunk, value_ranges):
+            row = list(value_range[0]) if value_range else []
+            fetched[row_index] = row + [""] * (width - len(row))
+    return fetched
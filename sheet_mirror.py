@@ -0,0 +1,414 @@
+# sheet_mirror.py — local SQLite copy of the Raw Events worksheet
+#
+# Upload and export used to read the whole tab from Google on every run. With
+# the mirror, reads are served from SQLite (export's "new" rows straight from
+# the site sync status index) and every write still goes to the sheet, then
+# gets applied to the mirror, so only deltas ever leave this machine.
+#
+# A mirror is keyed by spreadsheet and worksheet, not by library: libraries
+# that share a tab share one copy, so one library's writes are what the next
+# library's reads see.
+#
+# Before serving the first read in a run, MirroredSheet compares the sheet's
+# link, Site Sync Status and Row Fingerprint columns with the mirror (one
+# batched read of three columns) and re-pulls the whole tab if any of them
+# differ. Hand edits elsewhere in a row are left to the reconcile command:
+#     python sheet_mirror.py reconcile [library ...]
+# which diffs the full tab against the mirror, reports drift and repairs it.
+# Set SHEET_MIRROR_MAX_AGE_MINUTES to also re-pull once a mirror is that old.
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+from gspread.utils import a1_to_rowcol, numericise_all
+
+from instrumentation import span, count
+from sheet_diff import FINGERPRINT_HEADER, column_letter
+from sheet_writes import appended_row_numbers
+
+SHEET_MIRROR_ENABLED = os.environ.get("SHEET_MIRROR", "1") == "1"
+SHEET_MIRROR_PATH = os.environ.get("SHEET_MIRROR_PATH", "sheet_mirror.sqlite3")
+SHEET_MIRROR_VERIFY = os.environ.get("SHEET_MIRROR_VERIFY", "1") == "1"
+# Optional full re-pull once the mirror is this old (off by default: it reads the whole tab)
+SHEET_MIRROR_MAX_AGE_MINUTES = float(os.environ.get("SHEET_MIRROR_MAX_AGE_MINUTES") or 0)
+# Bump when the tables change; an older mirror is dropped and pulled again
+MIRROR_SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_meta (
+    sheet_key TEXT PRIMARY KEY,
+    headers TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    sheet_key TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    site_sync_status TEXT NOT NULL,
+    cells TEXT NOT NULL,
+    PRIMARY KEY (sheet_key, row_index)
+);
+CREATE INDEX IF NOT EXISTS sheet_rows_status ON sheet_rows (sheet_key, site_sync_status)
+"""
+
+_A1_RANGE = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+def _column_number(letters):
+    number = 0
+    for char in letters:
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def _trim(cells):
+    cells = list(cells)
+    while cells and cells[-1] == "":
+        cells.pop()
+    return cells
+
+
+class SheetMirror:
+    def __init__(self, spreadsheet_name, worksheet_name, path=SHEET_MIRROR_PATH):
+        self.key = f"{spreadsheet_name}/{worksheet_name}"
+        self.path = path
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != MIRROR_SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS sheet_rows")
+                conn.execute("DROP TABLE IF EXISTS sheet_meta")
+                conn.execute(f"PRAGMA user_version = {MIRROR_SCHEMA_VERSION}")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    # --- reads ---
+
+    def headers(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT headers FROM sheet_meta WHERE sheet_key = ?", (self.key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def is_loaded(self):
+        return self.headers() is not None
+
+    def synced_at(self):
+        """Epoch seconds of the last full pull, None if never pulled."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT synced_at FROM sheet_meta WHERE sheet_key = ?", (self.key,)).fetchone()
+        return row[0] if row else None
+
+    def _column(self, headers, name, default):
+        return headers.index(name) if name in headers else default
+
+    def rows(self):
+        """{row_index: cells} for every stored data row."""
+        with self._connect() as conn:
+            found = conn.execute(
+                "SELECT row_index, cells FROM sheet_rows WHERE sheet_key = ? ORDER BY row_index", (self.key,)
+            ).fetchall()
+        return {row_index: json.loads(cells) for row_index, cells in found}
+
+    def values(self):
+        """Header plus data rows, rectangular like Worksheet.get_all_values()."""
+        headers = self.headers() or []
+        rows = self.rows()
+        last = max(rows, default=1)
+        grid = [headers] + [rows.get(i, []) for i in range(2, last + 1)]
+        while len(grid) > 1 and not any(grid[-1]):
+            grid.pop()
+        width = max((len(r) for r in grid), default=0)
+        return [list(r) + [""] * (width - len(r)) for r in grid]
+
+    def columns(self, indexes):
+        """Data-row values of each 0-based column in ``indexes``, in row order (for drift checks)."""
+        rows = self.values()[1:]
+        return [[row[i] if i < len(row) else "" for row in rows] for i in indexes]
+
+    def rows_with_status(self, status):
+        with self._connect() as conn:
+            found = conn.execute(
+                "SELECT row_index, cells FROM sheet_rows WHERE sheet_key = ? AND site_sync_status = ? ORDER BY row_index",
+                (self.key, status.strip().lower()),
+            ).fetchall()
+        return {row_index: json.loads(cells) for row_index, cells in found}
+
+    # --- writes ---
+
+    def _row_params(self, headers, row_index, cells):
+        status_col = self._column(headers, "Site Sync Status", 15)
+        status = cells[status_col].strip().lower() if status_col < len(cells) else ""
+        return (self.key, row_index, status, json.dumps(_trim(cells), ensure_ascii=False))
+
+    def load(self, values):
+        """Replace the mirror with a full copy of the tab (header row first)."""
+        headers = _trim(values[0]) if values else []
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sheet_rows WHERE sheet_key = ?", (self.key,))
+            conn.executemany(
+                "INSERT INTO sheet_rows VALUES (?, ?, ?, ?)",
+                [self._row_params(headers, i, row) for i, row in enumerate(values[1:], start=2) if any(row)],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sheet_meta VALUES (?, ?, ?)",
+                (self.key, json.dumps(headers, ensure_ascii=False), time.time()),
+            )
+        count("mirror.rows_loaded", max(0, len(values) - 1), sheet=self.key)
+
+    def apply_updates(self, requests):
+        """Mirror a Worksheet.batch_update payload (A1 ranges with value grids).
+
+        Reads and writes happen in one transaction, so concurrent chunks from
+        sheet_writes touching the same row don't lose each other's cells.
+        """
+        placed = []
+        for request in requests:
+            first_row, first_col = a1_to_rowcol(request["range"].split("!")[-1].split(":")[0])
+            for r, values in enumerate(request["values"], start=first_row):
+                placed.append((r, first_col, [str(v) for v in values]))
+        touched = sorted({r for r, _, _ in placed if r > 1})
+
+        with self._connect() as conn:
+            found = conn.execute("SELECT headers FROM sheet_meta WHERE sheet_key = ?", (self.key,)).fetchone()
+            headers = json.loads(found[0]) if found else []
+            rows = {}
+            for start in range(0, len(touched), 500):
+                batch = touched[start:start + 500]
+                rows.update(conn.execute(
+                    f"SELECT row_index, cells FROM sheet_rows WHERE sheet_key = ? AND row_index IN ({','.join('?' * len(batch))})",
+                    (self.key, *batch),
+                ).fetchall())
+            rows = {r: json.loads(cells) for r, cells in rows.items()}
+            for r, first_col, values in placed:
+                cells = headers if r == 1 else rows.setdefault(r, [])
+                cells.extend([""] * (first_col - 1 + len(values) - len(cells)))
+                cells[first_col - 1:first_col - 1 + len(values)] = values
+            conn.executemany(
+                "INSERT OR REPLACE INTO sheet_rows VALUES (?, ?, ?, ?)",
+                [self._row_params(headers, r, rows[r]) for r in touched],
+            )
+            conn.execute(
+                "UPDATE sheet_meta SET headers = ? WHERE sheet_key = ?",
+                (json.dumps(_trim(headers), ensure_ascii=False), self.key),
+            )
+        count("mirror.rows_written", len(touched), sheet=self.key)
+
+    def apply_append(self, new_rows, first_row):
+        """Mirror rows the sheet reported appending at ``first_row`` onwards."""
+        with self._connect() as conn:
+            found = conn.execute("SELECT headers FROM sheet_meta WHERE sheet_key = ?", (self.key,)).fetchone()
+            headers = json.loads(found[0]) if found else []
+            conn.executemany(
+                "INSERT OR REPLACE INTO sheet_rows VALUES (?, ?, ?, ?)",
+                [self._row_params(headers, r, [str(v) for v in row]) for r, row in enumerate(new_rows, start=first_row)],
+            )
+        count("mirror.rows_written", len(new_rows), sheet=self.key)
+
+    def invalidate(self):
+        """Drop the mirror so the next read pulls the whole tab again."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sheet_rows WHERE sheet_key = ?", (self.key,))
+            conn.execute("DELETE FROM sheet_meta WHERE sheet_key = ?", (self.key,))
+
+
+class MirroredSheet:
+    """Worksheet stand-in: reads come from the mirror, writes go to the sheet and then the mirror."""
+
+    def __init__(self, sheet, mirror):
+        self.sheet = sheet
+        self.mirror = mirror
+        self._checked = False
+
+    def __getattr__(self, name):
+        return getattr(self.sheet, name)
+
+    def pull(self):
+        with span("mirror.pull", sheet=self.mirror.key):
+            self.mirror.load(self.sheet.get_all_values())
+        self._checked = True
+
+    def _ensure_fresh(self):
+        if self._checked:
+            return
+        synced_at = self.mirror.synced_at()
+        if synced_at is None:
+            print(f"🪞 Building sheet mirror for {self.mirror.key}")
+            self.pull()
+            return
+        if SHEET_MIRROR_MAX_AGE_MINUTES and time.time() - synced_at > SHEET_MIRROR_MAX_AGE_MINUTES * 60:
+            print(f"🪞 Sheet mirror for {self.mirror.key} is over {SHEET_MIRROR_MAX_AGE_MINUTES:.0f} min old, re-pulling")
+            count("mirror.scheduled_repulls", 1, sheet=self.mirror.key)
+            self.pull()
+            return
+        if SHEET_MIRROR_VERIFY and self._columns_drifted():
+            count("mirror.drift_repulls", 1, sheet=self.mirror.key)
+            self.pull()
+            return
+        self._checked = True
+
+    def _columns_drifted(self):
+        """Compare the link, status and fingerprint columns with the sheet in one read."""
+        headers = self.mirror.headers() or []
+        names = {"link": 1, "Site Sync Status": self.mirror._column(headers, "Site Sync Status", 15)}
+        if FINGERPRINT_HEADER in headers:
+            names[FINGERPRINT_HEADER] = headers.index(FINGERPRINT_HEADER)
+        indexes = list(names.values())
+        with span("mirror.verify", sheet=self.mirror.key):
+            live = self.sheet.batch_get([f"{column_letter(i + 1)}2:{column_letter(i + 1)}" for i in indexes])
+        stored = self.mirror.columns(indexes)
+        for name, live_range, stored_column in zip(names, live, stored):
+            live_column = _trim(row[0].strip() if row else "" for row in live_range)
+            stored_column = _trim(value.strip() for value in stored_column)
+            if live_column != stored_column:
+                print(f"🪞 Mirror's {name} column is out of step with the sheet, re-pulling")
+                return True
+        return False
+
+    def row_values(self, row, **kwargs):
+        self._ensure_fresh()
+        return _trim(self.mirror.headers()) if row == 1 else _trim(self.mirror.rows().get(row, []))
+
+    def get_all_values(self, **kwargs):
+        self._ensure_fresh()
+        count("mirror.reads_served", 1, sheet=self.mirror.key)
+        return self.mirror.values()
+
+    def get_all_records(self, **kwargs):
+        self._ensure_fresh()
+        count("mirror.reads_served", 1, sheet=self.mirror.key)
+        values = self.mirror.values()
+        if not values:
+            return []
+        headers = values[0]
+        return [dict(zip(headers, numericise_all(row))) for row in values[1:]]
+
+    def records_with_status(self, site_sync_status):
+        """[(row number, record)] for rows with this Site Sync Status, via the status index."""
+        self._ensure_fresh()
+        count("mirror.reads_served", 1, sheet=self.mirror.key)
+        headers = self.mirror.headers() or []
+        rows = self.mirror.rows_with_status(site_sync_status)
+        return [
+            (row_index, dict(zip(headers, numericise_all(cells + [""] * (len(headers) - len(cells))))))
+            for row_index, cells in rows.items()
+        ]
+
+    def batch_get(self, ranges, **kwargs):
+        self._ensure_fresh()
+        count("mirror.reads_served", 1, sheet=self.mirror.key)
+        values = self.mirror.values()
+        results = []
+        for a1 in ranges:
+            start_col, start_row, end_col, end_row = _A1_RANGE.match(a1.split("!")[-1]).groups()
+            first_col = _column_number(start_col) if start_col else 1
+            first_row = int(start_row) if start_row else 1
+            if end_col is None and end_row is None:
+                last_col, last_row = first_col, first_row
+            else:
+                last_col = _column_number(end_col) if end_col else (_column_number(start_col) if start_col else None)
+                last_row = int(end_row) if end_row else len(values)
+            grid = []
+            for row in values[first_row - 1:last_row]:
+                cells = row[first_col - 1:last_col] if last_col else row[first_col - 1:]
+                grid.append(_trim(cells))
+            while grid and not grid[-1]:
+                grid.pop()
+            results.append(grid)
+        return results
+
+    def batch_update(self, data, **kwargs):
+        response = self.sheet.batch_update(data, **kwargs)
+        self.mirror.apply_updates(data)
+        return response
+
+    def append_rows(self, values, **kwargs):
+        response = self.sheet.append_rows(values, **kwargs)
+        first_row = appended_row_numbers(response, 1)[0]
+        if first_row is None:
+            # No updatedRange to place the rows by; pull the tab again on the next read
+            self.mirror.invalidate()
+            self._checked = False
+        else:
+            self.mirror.apply_append(values, first_row)
+        return response
+
+
+def mirrored(sheet, spreadsheet_name, worksheet_name):
+    """Wrap a worksheet with its tab's mirror (a no-op when disabled or already wrapped)."""
+    if not SHEET_MIRROR_ENABLED or isinstance(sheet, MirroredSheet):
+        return sheet
+    return MirroredSheet(sheet, SheetMirror(spreadsheet_name, worksheet_name))
+
+
+def records_with_status(sheet, site_sync_status):
+    """[(row number, record)] for rows with this Site Sync Status, mirrored or not."""
+    if isinstance(sheet, MirroredSheet):
+        return sheet.records_with_status(site_sync_status)
+    wanted = site_sync_status.strip().lower()
+    return [
+        (row_index, record) for row_index, record in enumerate(sheet.get_all_records(), start=2)
+        if str(record.get("Site Sync Status", "")).strip().lower() == wanted
+    ]
+
+
+def reconcile(library, repair=True):
+    """Diff the live tab against the mirror cell by cell; with ``repair`` the sheet's contents win."""
+    from library_profile import get_library_profile
+    from upload_to_sheets import connect_to_sheet
+
+    config = get_library_profile(library).config
+    sheet = connect_to_sheet(config["spreadsheet_name"], config["worksheet_name"])
+    mirror = SheetMirror(config["spreadsheet_name"], config["worksheet_name"])
+    with span("mirror.reconcile_read", library=library):
+        live = sheet.get_all_values()
+    stored = mirror.values() if mirror.is_loaded() else []
+
+    drifted = []
+    for i in range(max(len(live), len(stored))):
+        live_row = _trim(live[i]) if i < len(live) else []
+        stored_row = _trim(stored[i]) if i < len(stored) else []
+        if live_row != stored_row:
+            cells = [
+                j for j in range(max(len(live_row), len(stored_row)))
+                if (live_row[j] if j < len(live_row) else "") != (stored_row[j] if j < len(stored_row) else "")
+            ]
+            drifted.append((i + 1, cells))
+
+    for row_number, cells in drifted[:20]:
+        print(f"🪞 {library} row {row_number}: {len(cells)} cells differ (columns {', '.join(str(c + 1) for c in cells[:8])})")
+    print(f"🪞 {library}: {len(drifted)} rows drifted out of {max(len(live), len(stored))}")
+    count("mirror.rows_drifted", len(drifted), library=library)
+    if repair and (drifted or not stored):
+        mirror.load(live)
+        print(f"✅ {library} mirror repaired from the sheet")
+    return drifted
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "reconcile"
+    libraries = sys.argv[2:] or ["vbpl"]
+    for library in libraries:
+        if command == "reconcile":
+            reconcile(library)
+        elif command == "check":
+            reconcile(library, repair=False)
+        else:
+            print("Usage: python sheet_mirror.py reconcile|check [library ...]")
+            sys.exit(2)
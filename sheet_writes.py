@@ -0,0 +1,185 @@
+# sheet_writes.py — plan and dispatch worksheet writes in as few requests as possible
+#
+# Callers hand over the same payloads they used to pass to batch_update: a list
+# of {"range": "A5:Q5", "values": [[...]]}. The planner flattens them into
+# cells (later requests win, as in one batch_update), merges each row's
+# adjacent cells into runs, stacks runs with the same columns on consecutive
+# rows into blocks, then packs the blocks into chunks under the per-request
+# limits and sends the chunks concurrently. Appends are chunked but stay
+# sequential so rows keep their order.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+from instrumentation import count
+
+SHEET_WRITE_WORKERS = int(os.environ.get("SHEET_WRITE_WORKERS", "4"))
+SHEET_MAX_CELLS_PER_REQUEST = int(os.environ.get("SHEET_MAX_CELLS_PER_REQUEST", "40000"))
+SHEET_MAX_RANGES_PER_REQUEST = int(os.environ.get("SHEET_MAX_RANGES_PER_REQUEST", "500"))
+SHEET_MAX_PAYLOAD_BYTES = int(os.environ.get("SHEET_MAX_PAYLOAD_BYTES", str(2 * 1024 * 1024)))
+SHEET_APPEND_CHUNK_ROWS = int(os.environ.get("SHEET_APPEND_CHUNK_ROWS", "500"))
+
+
+class WriteReport:
+    def __init__(self, label):
+        self.label = label
+        self.requests_planned = 0
+        self.requests_sent = 0
+        self.cells_written = 0
+        self.rows_appended = 0
+        self.appended_rows = []     # sheet row number of each appended row, None if unknown
+        self.failures = []          # (description, error)
+        self.failed_rows = set()    # sheet rows touched by a failed update chunk
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def print_summary(self):
+        print(
+            f"✍️ {self.label}: {self.requests_sent}/{self.requests_planned} requests, "
+            f"{self.cells_written} cells, {self.rows_appended} rows appended"
+        )
+        for description, error in self.failures:
+            print(f"❌ {self.label} failed for {description}: {error}")
+
+
+def _cells(requests):
+    cells = {}
+    for request in requests:
+        first_row, first_col = a1_to_rowcol(request["range"].split("!")[-1].split(":")[0])
+        for i, values in enumerate(request["values"]):
+            for j, value in enumerate(values):
+                cells[(first_row + i, first_col + j)] = value
+    return cells
+
+
+def plan_blocks(requests):
+    """Coalesce update payloads into (first_row, first_col, grid) blocks covering exactly the same cells."""
+    by_row = {}
+    for (row, col), value in _cells(requests).items():
+        by_row.setdefault(row, {})[col] = value
+
+    # Runs of adjacent columns within a row
+    runs = {}
+    for row, cols in by_row.items():
+        ordered = sorted(cols)
+        start = prev = ordered[0]
+        for col in ordered[1:] + [None]:
+            if col is not None and col == prev + 1:
+                prev = col
+                continue
+            runs.setdefault((start, prev), []).append((row, [cols[c] for c in range(start, prev + 1)]))
+            if col is not None:
+                start = prev = col
+
+    # Runs over the same columns on consecutive rows become one block
+    blocks = []
+    for (first_col, _), row_runs in runs.items():
+        row_runs.sort(key=lambda run: run[0])
+        block_row, grid = row_runs[0][0], [row_runs[0][1]]
+        for row, values in row_runs[1:]:
+            if row == block_row + len(grid):
+                grid.append(values)
+            else:
+                blocks.append((block_row, first_col, grid))
+                block_row, grid = row, [values]
+        blocks.append((block_row, first_col, grid))
+    blocks.sort(key=lambda block: (block[0], block[1]))
+    return blocks
+
+
+def _block_payload(first_row, first_col, grid):
+    last = rowcol_to_a1(first_row + len(grid) - 1, first_col + len(grid[0]) - 1)
+    return {"range": f"{rowcol_to_a1(first_row, first_col)}:{last}", "values": grid}
+
+
+def plan_chunks(requests, max_cells=SHEET_MAX_CELLS_PER_REQUEST, max_ranges=SHEET_MAX_RANGES_PER_REQUEST,
+                max_bytes=SHEET_MAX_PAYLOAD_BYTES):
+    """Split coalesced blocks into batch_update payloads that each stay under the limits."""
+    width_limited = []
+    for first_row, first_col, grid in plan_blocks(requests):
+        rows_per_piece = max(1, max_cells // len(grid[0]))
+        for start in range(0, len(grid), rows_per_piece):
+            width_limited.append(_block_payload(first_row + start, first_col, grid[start:start + rows_per_piece]))
+
+    chunks = []
+    current, cells, size = [], 0, 0
+    for payload in width_limited:
+        payload_cells = len(payload["values"]) * len(payload["values"][0])
+        payload_size = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        if current and (len(current) >= max_ranges or cells + payload_cells > max_cells or size + payload_size > max_bytes):
+            chunks.append(current)
+            current, cells, size = [], 0, 0
+        current.append(payload)
+        cells += payload_cells
+        size += payload_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def write_updates(sheet, requests, label="sheet write", workers=SHEET_WRITE_WORKERS, **kwargs):
+    """batch_update ``requests`` as coalesced chunks in parallel; failures are reported, not raised."""
+    report = WriteReport(label)
+    if not requests:
+        return report
+    chunks = plan_chunks(requests)
+    report.requests_planned = len(chunks)
+
+    def _send(chunk):
+        sheet.batch_update(chunk, **kwargs)
+        return sum(len(p["values"]) * len(p["values"][0]) for p in chunk)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        futures = [(chunk, pool.submit(_send, chunk)) for chunk in chunks]
+        for chunk, future in futures:
+            try:
+                report.cells_written += future.result()
+                report.requests_sent += 1
+            except Exception as e:
+                ranges = [p["range"] for p in chunk]
+                report.failures.append((f"{len(ranges)} ranges ({ranges[0]} … {ranges[-1]})", e))
+                for payload in chunk:
+                    first_row = a1_to_rowcol(payload["range"].split(":")[0])[0]
+                    report.failed_rows.update(range(first_row, first_row + len(payload["values"])))
+
+    count("sheets.write_requests", report.requests_sent, label=label)
+    count("sheets.write_ranges_in", len(requests), label=label)
+    count("sheets.write_failures", len(report.failures), label=label)
+    report.print_summary()
+    return report
+
+
+def appended_row_numbers(response, expected):
+    """Row numbers an append landed on, from the response's updatedRange; ``None`` each if it can't tell."""
+    try:
+        updated_range = response["updates"]["updatedRange"]
+        first = a1_to_rowcol(updated_range.split("!")[-1].split(":")[0])[0]
+    except (TypeError, KeyError, IndexError, ValueError, AttributeError):
+        return [None] * expected
+    return list(range(first, first + expected))
+
+
+def append_rows_chunked(sheet, rows, label="sheet append", chunk_rows=SHEET_APPEND_CHUNK_ROWS, **kwargs):
+    """append_rows in order-preserving chunks; stops at the first failed chunk and reports what was left."""
+    report = WriteReport(label)
+    chunks = [rows[i:i + chunk_rows] for i in range(0, len(rows), chunk_rows)]
+    report.requests_planned = len(chunks)
+    for i, chunk in enumerate(chunks):
+        try:
+            response = sheet.append_rows(chunk, **kwargs)
+        except Exception as e:
+            remaining = sum(len(c) for c in chunks[i:])
+            report.failures.append((f"{remaining} rows not appended", e))
+            break
+        report.requests_sent += 1
+        report.rows_appended += len(chunk)
+        report.appended_rows.extend(appended_row_numbers(response, len(chunk)))
+    count("sheets.append_requests", report.requests_sent, label=label)
+    if rows:
+        report.print_summary()
+    return report
@@ -0,0 +1,223 @@
+# throttle.py — per-host token-bucket rate limiting, retries with jittered
+# exponential backoff, and a circuit breaker that pauses a host when its
+# recent error rate spikes.
+#
+# All page loads against a host share one HostThrottle (see throttle_for), so
+# raising DETAIL_CONCURRENCY or MAX_SESSIONS cannot outrun the configured rate.
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+HOST_RATE_PER_SEC = float(os.environ.get("HOST_RATE_PER_SEC", "2"))
+HOST_BURST = int(os.environ.get("HOST_BURST", "4"))
+RETRY_MAX = int(os.environ.get("RETRY_MAX", "3"))
+RETRY_BASE_SECONDS = 2.0
+RETRY_CAP_SECONDS = 30.0
+BREAKER_WINDOW = 20
+BREAKER_MIN_SAMPLES = 5
+BREAKER_ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_COOLDOWN_SECONDS", "60"))
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` are available; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def snapshot(self):
+        with self._lock:
+            self._refill()
+            return {"rate": self.rate, "capacity": self.capacity, "tokens": round(self.tokens, 2)}
+
+
+class CircuitBreaker:
+    """closed → open when the error rate over the last BREAKER_WINDOW calls is too
+    high; open → half-open after the cooldown; one success in half-open closes it."""
+
+    def __init__(self, window=BREAKER_WINDOW, min_samples=BREAKER_MIN_SAMPLES,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.outcomes = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    def wait_time(self):
+        """Seconds until a request may go through (0 when allowed now)."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining <= 0:
+                self.state = "half-open"
+                return 0.0
+            return remaining
+
+    def record(self, success):
+        with self._lock:
+            self.outcomes.append(success)
+            if self.state == "half-open":
+                if success:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            failures = self.outcomes.count(False)
+            if (self.state == "closed" and len(self.outcomes) >= self.min_samples
+                    and failures / len(self.outcomes) >= self.error_rate):
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        print(f"🔌 Circuit opened, backing off {self.cooldown:.0f}s")
+
+    def snapshot(self):
+        with self._lock:
+            samples = len(self.outcomes)
+            return {
+                "state": self.state,
+                "opens": self.opens,
+                "recent_error_rate": round(self.outcomes.count(False) / samples, 2) if samples else 0.0,
+            }
+
+
+def backoff_delay(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_CAP_SECONDS):
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class HostThrottle:
+    def __init__(self, host, rate=HOST_RATE_PER_SEC, burst=HOST_BURST):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.counters = {"requests": 0, "successes": 0, "failures": 0, "retries": 0, "gave_up": 0, "wait_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def before_request(self):
+        """Wait for the breaker and a rate-limit token before touching the host."""
+        waited = 0.0
+        delay = self.breaker.wait_time()
+        while delay > 0:
+            time.sleep(delay)
+            waited += delay
+            delay = self.breaker.wait_time()
+        waited += self.bucket.acquire()
+        self._count("requests")
+        if waited:
+            self._count("wait_seconds", waited)
+
+    def record_success(self):
+        self.breaker.record(True)
+        self._count("successes")
+
+    def record_failure(self):
+        self.breaker.record(False)
+        self._count("failures")
+
+    def record_retry(self):
+        self._count("retries")
+
+    def record_gave_up(self):
+        self._count("gave_up")
+
+    def call(self, fn, *args, retries=RETRY_MAX, is_failure=None, **kwargs):
+        """Run ``fn`` under the rate limit, retrying exceptions (and results
+        ``is_failure`` flags) with jittered exponential backoff."""
+        attempt = 0
+        while True:
+            self.before_request()
+            try:
+                result = fn(*args, **kwargs)
+                if is_failure and is_failure(result):
+                    raise RetryableResult(result)
+                self.record_success()
+                return result
+            except Exception as e:
+                self.record_failure()
+                if attempt >= retries:
+                    self.record_gave_up()
+                    if isinstance(e, RetryableResult):
+                        return e.result
+                    raise
+                delay = backoff_delay(attempt)
+                self.record_retry()
+                print(f"🔁 {self.host}: attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters["wait_seconds"] = round(counters["wait_seconds"], 2)
+        return {"host": self.host, **counters, "bucket": self.bucket.snapshot(), "breaker": self.breaker.snapshot()}
+
+
+class RetryableResult(Exception):
+    def __init__(self, result):
+        super().__init__(f"retryable result {result!r:.80}")
+        self.result = result
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def throttle_for(url):
+    host = urlparse(url).hostname or url
+    # facebook.com and www.facebook.com are the same backend
+    host = host[4:] if host.startswith("www.") else host
+    with _registry_lock:
+        if host not in _registry:
+            _registry[host] = HostThrottle(host, HOST_RATE_PER_SEC, HOST_BURST)
+        return _registry[host]
+
+
+def throttle_snapshot():
+    with _registry_lock:
+        throttles = list(_registry.values())
+    return {t.host: t.snapshot() for t in throttles}
+
+
+def print_throttle_summary():
+    for host, snap in throttle_snapshot().items():
+        print(
+            f"🚦 {host}: {snap['requests']} requests, {snap['failures']} failures, "
+            f"{snap['retries']} retries, {snap['gave_up']} gave up, waited {snap['wait_seconds']}s, "
+            f"breaker {snap['breaker']['state']} (opened {snap['breaker']['opens']}x)"
+        )
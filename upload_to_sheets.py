@@ -1,15 +1,20 @@
 from datetime import datetime
 import os
-import gspread
-from google.oauth2 import service_account
+import time
+import threading
+from queue import Queue, Empty
+from google_clients import get_worksheet
+from api_scheduler import PRIORITY_LOW
 import traceback
-from config import get_library_config
+from library_profile import get_library_profile
 import json
-import re
-from constants import LIBRARY_CONSTANTS, TITLE_KEYWORD_TO_CATEGORY
-from constants import COMBINED_KEYWORD_TO_CATEGORY
+from categorizer import event_categories
+from sheet_diff import read_sheet_index, ensure_fingerprint_column, fetch_rows
+from sheet_mirror import mirrored
+from sheet_writes import write_updates, append_rows_chunked
 import pandas as pd
 from export_to_csv import send_notification_email_with_attachment
+from instrumentation import span, record_span, count
 
 
 def _clean_link(url: str) -> str:
@@ -21,344 +26,383 @@ def _clean_link(url: str) -> str:
 
 
 def connect_to_sheet(spreadsheet_name, worksheet_name):
-    creds = service_account.Credentials.from_service_account_file(
-        "/etc/secrets/GOOGLE_APPLICATION_CREDENTIALS_JSON",
-        scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    )
-    client = gspread.authorize(creds)
-    return client.open(spreadsheet_name).worksheet(worksheet_name)
+    return get_worksheet(spreadsheet_name, worksheet_name)
 
 
 def normalize(row):
     return [cell.strip() for cell in row[:13]] + [""] * (13 - len(row))
 
 
-def upload_events_to_sheet(events, sheet=None, mode="full", library="vbpl", age_to_categories={}, name_suffix_map={}):
-    config = get_library_config(library)
-    SPREADSHEET_NAME = config["spreadsheet_name"]
-    WORKSHEET_NAME = config["worksheet_name"]
+def _build_row_core(event, link, profile):
+    categories = event_categories(event, profile)
+    event_name = profile.sheet_event_name(event.get("Event Name", ""), event.get("Location", ""))
+
+    if not categories:
+        categories = event.get("Categories", "") or profile.default_categories
+
+    return [
+        event_name,
+        link,
+        event.get("Event Status", ""),
+        event.get("Time", ""),
+        event.get("Ages", ""),
+        event.get("Location", ""),
+        event.get("Month", ""),
+        event.get("Day", ""),
+        event.get("Year", ""),
+        event.get("Event Description", ""),
+        event.get("Series", ""),
+        event.get("Program Type", ""),
+        categories
+    ]
+
+
+class UploadStats:
+    """Running totals for one upload, summed over every batch written into it."""
+
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.unchanged = 0
+        self.fetched = 0
+        self.failed = 0             # rows whose write the sheet rejected; retried next run
+        self.review_rows = []
+
+
+def _open_upload(sheet, library):
+    """Read the sheet index once and make sure the fingerprint column exists."""
+    with span("upload.sheet_read", library=library):
+        index = read_sheet_index(sheet, _clean_link)
+    ensure_fingerprint_column(sheet, index)
+    return index
+
+
+def _upload_batch(events, sheet, index, profile, library, stats):
+    """Diff ``events`` against ``index``, write the changes and keep ``index`` current.
+
+    Returns the raw links of the events that are on the sheet afterwards.
+    """
+    link_to_row_index = index.link_rows
+    new_rows = []
+    new_cores = []
+    new_links = []
+    update_requests = [index.header_update()] if index.header_missing else []
+    written = []                # (raw link, link, core, row, is content update) per updated row
+    confirmed_links = []
+
+    diff_started = time.perf_counter()
+    prepared = []
+    for event in events:
+        try:
+            raw_link = (event.get("Event Link", "") or "").strip()
+            if not raw_link:
+                print(f"⚠️  Skipping malformed event (missing link): {event.get('Event Name','')}")
+                stats.skipped += 1
+                continue
+
+            link = _clean_link(raw_link)
+            row_core = _build_row_core(event, link, profile)
+            print("🧾 Raw row_core before normalize:", row_core)
+            new_core = normalize(row_core)
+            if link in link_to_row_index and index.is_unchanged(link, new_core):
+                stats.unchanged += 1
+                confirmed_links.append(raw_link)
+                continue
+            prepared.append((event, raw_link, link, new_core))
+        except Exception as row_err:
+            print(f"❌ Error processing event: {event.get('Event Name')} — {event.get('Event Link')}")
+            traceback.print_exc()
+            stats.skipped += 1
+
+    # Full rows only for links whose fingerprint differs or is missing
+    stale_rows = {link_to_row_index[link] for _, _, link, _ in prepared if link in link_to_row_index}
+    with span("upload.row_fetch", library=library, rows=len(stale_rows)):
+        fetched = fetch_rows(sheet, stale_rows)
+    stats.fetched += len(stale_rows)
+    existing_data = {link: fetched[row] for link, row in link_to_row_index.items() if row in fetched}
+
+    for event, raw_link, link, new_core in prepared:
+        try:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            existing_row = existing_data.get(link, [""] * 16)
+            existing_core = normalize(existing_row)
+
+            # Flag if required fields are missing
+            missing_fields = []
+            if not event.get("Event Description", "").strip():
+                missing_fields.append("description")
+            if not event.get("Location", "").strip():
+                missing_fields.append("location")
+            
+            if missing_fields:
+                site_sync_status = "REVIEW NEEDED - MISSING INFO"
+                status = "review needed"
+            else:
+                status = "new"
+                site_sync_status = existing_row[15] if link in existing_data else "new"
+
+            if link in existing_data:
+                existing_vals = {
+                    "status": existing_row[2],
+                    "month": existing_row[6],
+                    "day": existing_row[7],
+                    "year": existing_row[8],
+                    "time": existing_row[3],
+                }
+                current_vals = {
+                    "status": event.get("Event Status", ""),
+                    "month": event.get("Month", ""),
+                    "day": event.get("Day", ""),
+                    "year": event.get("Year", ""),
+                    "time": event.get("Time", "")
+                }
+                changed_to_cancelled = (
+                    existing_vals["status"].lower() != current_vals["status"].lower()
+                    and current_vals["status"].lower() == "cancelled"
+                )
+                date_changed = (
+                    existing_vals["month"] != current_vals["month"]
+                    or existing_vals["day"] != current_vals["day"]
+                    or existing_vals["year"] != current_vals["year"]
+                )
+                time_changed = existing_vals["time"] != current_vals["time"]
+                if changed_to_cancelled or date_changed or time_changed:
+                    status = "updates needed"
+                    if site_sync_status == "on site":
+                        site_sync_status = "updates needed"
+                else:
+                    status = existing_row[14]
+                    site_sync_status = site_sync_status or ""
+
+            full_row = new_core + [now, status, site_sync_status]
+
+            if link not in existing_data:
+                print("🔍 New row to append:", full_row)
+                new_rows.append(full_row)
+                new_cores.append(new_core)
+                new_links.append((raw_link, link))
+
+            elif new_core != existing_core:
+                print(f"🔄 Updated row {link_to_row_index[link]}:", full_row)
+                row_index = link_to_row_index[link]
+                update_requests.append({
+                    "range": f"A{row_index}:Q{row_index}",
+                    "values": [full_row]
+                })
+                update_requests.append(index.fingerprint_update(row_index, new_core))
+                written.append((raw_link, link, new_core, row_index, True))
+
+            else:
+                # Same content, but the row had no (or an outdated) fingerprint yet
+                update_requests.append(index.fingerprint_update(link_to_row_index[link], new_core))
+                written.append((raw_link, link, new_core, link_to_row_index[link], False))
+        except Exception as row_err:
+            print(f"❌ Error processing event: {event.get('Event Name')} — {event.get('Event Link')}")
+            traceback.print_exc()
+            stats.skipped += 1
+
+    record_span("upload.diff", time.perf_counter() - diff_started, library=library, events=len(events))
+
+    # Rows only count (and are confirmed) once the sheet accepted their write
+    if update_requests:
+        with span("upload.batch_update", library=library, rows=len(update_requests)):
+            report = write_updates(sheet, update_requests, label=f"{library} row updates")
+        if 1 not in report.failed_rows:
+            index.header_missing = False
+        for raw_link, link, core, row_index, content_changed in written:
+            if row_index in report.failed_rows:
+                stats.failed += 1
+                continue
+            if content_changed:
+                stats.updated += 1
+            else:
+                stats.unchanged += 1
+            index.record_fingerprint(link, core)
+            confirmed_links.append(raw_link)
+
+    if new_rows:
+        print("🔍 Full row to upload:", full_row)
+        with span("upload.append", library=library, rows=len(new_rows)):
+            report = append_rows_chunked(
+                sheet,
+                [index.append_row(row, core) for row, core in zip(new_rows, new_cores)],
+                label=f"{library} new rows",
+                value_input_option="USER_ENTERED",
+            )
+        # Chunks go out in order and stop at the first failure, so the first rows_appended rows landed
+        landed = report.rows_appended
+        stats.added += landed
+        stats.failed += len(new_rows) - landed
+        stats.review_rows.extend(r for r in new_rows[:landed] if "REVIEW NEEDED" in r[-1])
+        for (raw_link, link), core, row_index in zip(new_links, new_cores, report.appended_rows):
+            index.record_row(link, row_index, core)
+            confirmed_links.append(raw_link)
+
+    return confirmed_links
+
+
+def _finish_upload(profile, library, mode, headers, stats):
+    """Once per upload: the review CSV and email, the Log tab row and the totals."""
+    config = profile.config
     LOG_WORKSHEET_NAME = config["log_worksheet_name"]
-    library_constants = LIBRARY_CONSTANTS.get(library, {})
-    program_type_to_categories = library_constants.get("program_type_to_categories", {})
-
-
-    PROGRAM_TYPE_TO_CATEGORIES = {
-        "Storytimes & Early Learning": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event, List - Storytimes",
-        "STEAM": f"Event Location - {config['organizer_name']}, List - STEM/STEAM, Audience - Free Event, Audience - Family Event",
-        "Computers & Technology": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Teens, Audience - Family Event",
-        "Workshops & Lectures": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
-        "Discussion Groups": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
-        "Arts & Crafts": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
-        "Hobbies": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
-        "Books & Authors": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
-        "Culture": f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event",
-        "History & Genealogy": f"Event Location - {config['organizer_name']}, Audience - Teens, Audience - Free Event"
-    }
+
+    # Export REVIEW NEEDED rows to CSV
+    review_rows = stats.review_rows
+    if review_rows:
+        review_df = pd.DataFrame(review_rows, columns=headers[:len(review_rows[0])])
+        review_path = f"Review Needed - Missing Info - {library}.csv"
+        with span("upload.review_csv_write", library=library, rows=len(review_rows)):
+            review_df.to_csv(review_path, index=False)
+        print(f"📎 Exported {len(review_rows)} flagged rows to {review_path}")
+
+        send_notification_email_with_attachment(
+        review_path,
+        f"{library.upper()} — Review Needed: Missing Info",
+        config["email_recipient"]
+       )
+
+    try:
+        log_sheet = connect_to_sheet(config["spreadsheet_name"], LOG_WORKSHEET_NAME).with_priority(PRIORITY_LOW)
+        log_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_row = [log_time, mode, stats.added, stats.updated, stats.skipped]
+        with span("upload.log_append", library=library):
+            log_sheet.append_row(log_row, value_input_option="USER_ENTERED")
+        print(f"📝 Logged summary to '{LOG_WORKSHEET_NAME}' tab.")
+    except Exception as e:
+        print(f"⚠️ Failed to log to {LOG_WORKSHEET_NAME} tab: {e}")
+
+    count("upload.rows_added", stats.added, library=library)
+    count("upload.rows_updated", stats.updated, library=library)
+    count("upload.rows_skipped", stats.skipped, library=library)
+    count("upload.rows_unchanged", stats.unchanged, library=library)
+    count("upload.rows_fetched", stats.fetched, library=library)
+    count("upload.rows_failed", stats.failed, library=library)
+    print(f"📦 {stats.added} new events added.")
+    print(f"🔁 {stats.updated} existing events updated.")
+    print(f"🟰 {stats.unchanged} events unchanged ({stats.fetched} full rows fetched).")
+    if stats.skipped:
+        print(f"🧹 {stats.skipped} malformed events skipped.")
+    if stats.failed:
+        print(f"❌ {stats.failed} rows could not be written and will be retried on the next run.")
+
+
+def upload_events_to_sheet(events, sheet=None, mode="full", library="vbpl", age_to_categories={}, name_suffix_map={}):
+    """Returns the raw links of the events that are on the sheet after this call."""
+    # The keyword arguments (not LIBRARY_CONSTANTS) decide the age and branch-name tables here
+    profile = get_library_profile(library).with_overrides(age_to_categories, name_suffix_map)
+    config = profile.config
 
     try:
         if sheet is None:
-            sheet = connect_to_sheet(SPREADSHEET_NAME, WORKSHEET_NAME)
+            sheet = connect_to_sheet(config["spreadsheet_name"], config["worksheet_name"])
+        sheet = mirrored(sheet, config["spreadsheet_name"], config["worksheet_name"])
 
-        rows = sheet.get_all_values()
-        headers = rows[0]
-        existing_rows = rows[1:]
+        index = _open_upload(sheet, library)
+        stats = UploadStats()
+        confirmed_links = _upload_batch(events, sheet, index, profile, library, stats)
+        _finish_upload(profile, library, mode, index.headers, stats)
+        return confirmed_links
 
-        for i, row in enumerate(existing_rows):
-            if len(row) < 16:
-                print(f"[WARN] Row {i + 2} too short: {len(row)} cols → {row}")
-                row += [""] * (16 - len(row))
+    except Exception as e:
+        print(f"❌ ERROR during upload_events_to_sheet: {e}")
+        traceback.print_exc()
+        return []
 
-        link_to_row_index = {}
-        existing_data = {}
 
-        for idx, row in enumerate(existing_rows):
-            if len(row) <= 1:
-                continue
-            clean_link = _clean_link(row[1].strip())
-            link_to_row_index[clean_link] = idx + 2
-            existing_data[clean_link] = row
-
-        added = 0
-        updated = 0
-        skipped = 0
-
-        new_rows = []
-        update_requests = []
-
-        for event in events:
-            try:
-                raw_link = (event.get("Event Link", "") or "").strip()
-                if not raw_link:
-                    print(f"⚠️  Skipping malformed event (missing link): {event.get('Event Name','')}")
-                    skipped += 1
-                    continue
-
-                link = _clean_link(raw_link)
-
-                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                program_type = event.get("Program Type", "")
-
-                if library == "ppl":
-                    # Use pre-tagged categories or fallback from scraper
-                    categories = event.get("Categories", "").strip()
-                    if not categories:
-                        categories = "Audience - Family Event, Audience - Free Event, Audience - Preschool Age, Audience - School Age, Event Location - Portsmouth"
-                
-                elif library == "hpl":
-                    program_types = [pt.strip().lower() for pt in program_type.split(",") if pt.strip()]
-                    matched_tags = []
-                    for pt in program_types:
-                        cat = program_type_to_categories.get(pt)
-                        if cat:
-                            matched_tags.extend([c.strip() for c in cat.split(",")])
-                    categories = ", ".join(dict.fromkeys(matched_tags))  # remove duplicates, preserve order
-                
-                else:
-                    # Default case for vbpl, npl, chpl, etc.
-                    categories = program_type_to_categories.get(program_type, "")
-
-                if library == "chpl" and age_to_categories:
-                    audience_keys = [a.strip() for a in event.get("Ages", "").split(",") if a.strip()]
-                    all_tags = []
-                    for tag in audience_keys:
-                        tags = age_to_categories.get(tag)
-                        if tags:
-                            all_tags.extend([t.strip() for t in tags.split(",")])
-                    if all_tags:
-                        categories = ", ".join(dict.fromkeys(all_tags))
-
-                ages_raw = event.get("Ages", "")
-                age_tags = []
-                nums = [int(n) for n in re.findall(r"\d+", ages_raw)]
-
-                if nums:
-                    min_age, max_age = min(nums), max(nums)
-                    if max_age <= 2:
-                        age_tags.append("Audience - Toddler/Infant")
-                    if max_age <= 4:
-                        age_tags.append("Audience - Parent & Me")
-                    if any(a in (3, 4) for a in nums):
-                        age_tags.append("Audience - Preschool Age")
-                    if max_age >= 5 and min_age <= 12:
-                        age_tags.append("Audience - School Age")
-                    if min_age >= 13:
-                        age_tags.append("Audience - Teens")
-
-                # Age-based category tags
-                audience_keys = [a.strip() for a in ages_raw.split(",") if a.strip()]
-                all_tags = []
-                
-                if age_to_categories:
-                    for tag in audience_keys:
-                        tags = age_to_categories.get(tag)
-                        if tags:
-                            all_tags.extend([t.strip() for t in tags.split(",")])
-                
-                # Add fuzzy age tags
-                if age_tags:
-                    all_tags.extend(age_tags)
-                
-                # Combine with existing program_type-based categories
-                base = [c.strip() for c in categories.split(",") if c.strip()]
-                combined = base + all_tags
-                categories = ", ".join(dict.fromkeys(combined))
-
-                categories = categories.replace("\u00A0", " ").replace("Â", "").strip()
-
-                # === Normalize title and description text
-                title_text = event.get("Event Name", "").lower()
-                full_text = f"{event.get('Event Name', '')} {event.get('Event Description', '')}".lower()
-                
-                title_based_tags = []
-                
-                # === Match single keywords (case-insensitive)
-                for keyword, cat in TITLE_KEYWORD_TO_CATEGORY.items():
-                    if keyword.lower() in title_text:
-                        title_based_tags.extend([c.strip() for c in cat.split(",")])
-                
-                # === Match combined keyword pairs (case-insensitive)
-                for (kw1, kw2), cat in COMBINED_KEYWORD_TO_CATEGORY.items():
-                    if kw1.lower() in full_text and kw2.lower() in full_text:
-                        title_based_tags.extend([c.strip() for c in cat.split(",")])
-                
-                # Final deduplication
-                tag_list = [c.strip() for c in categories.split(",") if c.strip()]
-
-                # Add age-based categories
-                tag_list.extend(all_tags)
-                
-                # Add title-based categories
-                tag_list.extend(title_based_tags)
-                
-                # Add fallback if nothing matched
-                if not tag_list:
-                    # Extract just the city name from known location formats
-                    raw_location = event.get("Location", "").strip()
-                    fallback_city = ""
-                
-                    if "Norfolk" in raw_location:
-                        fallback_city = "Norfolk"
-                    elif "Virginia Beach" in raw_location:
-                        fallback_city = "Virginia Beach"
-                    elif "Chesapeake" in raw_location:
-                        fallback_city = "Chesapeake"
-                    elif "Portsmouth" in raw_location:
-                        fallback_city = "Portsmouth"
-                    elif "Hampton" in raw_location:
-                        fallback_city = "Hampton"
-                    elif "Newport News" in raw_location:
-                        fallback_city = "Newport News"
-                    elif "Suffolk" in raw_location:
-                        fallback_city = "Suffolk"
-                
-                    fallback = f"Event Location - {fallback_city}, Audience - Free Event" if fallback_city else "Audience - Free Event"
-                    tag_list.append(fallback)
-
-                
-                # Final deduplication
-                categories = ", ".join(dict.fromkeys(tag_list))
-
-                name_original = event.get("Event Name", "")
-                # Remove any "@ LibraryName" from event titles before suffixing
-                name_without_at = re.sub(r"\s*@\s*[^@,;:\\/]+", "", name_original, flags=re.IGNORECASE).strip()
-                name_cleaned = re.sub(r"\s+at\s+.*", "", name_without_at, flags=re.IGNORECASE).strip()
-
-                loc = event.get("Location", "")
-                suffix = config.get("event_name_suffix", "")
-                loc_clean = re.sub(r"^Library Branch:", "", loc).strip()
-                display_loc = name_suffix_map.get(loc_clean, loc_clean)
-                
-                if name_cleaned.lower().endswith(display_loc.lower()):
-                    event_name = f"{name_cleaned}{suffix}"
-                else:
-                    event_name = f"{name_cleaned} at {display_loc}{suffix}"
-
-                if not categories:
-                    categories = event.get("Categories", "") or f"Event Location - {config['organizer_name']}, Audience - Free Event, Audience - Family Event"
-
-                row_core = [
-                    event_name,
-                    link,
-                    event.get("Event Status", ""),
-                    event.get("Time", ""),
-                    event.get("Ages", ""),
-                    event.get("Location", ""),
-                    event.get("Month", ""),
-                    event.get("Day", ""),
-                    event.get("Year", ""),
-                    event.get("Event Description", ""),
-                    event.get("Series", ""),
-                    program_type,
-                    categories
-                ]
-                print("🧾 Raw row_core before normalize:", row_core)
-                new_core = normalize(row_core)
-                existing_row = existing_data.get(link, [""] * 16)
-                existing_core = normalize(existing_row)
-
-                # Flag if required fields are missing
-                missing_fields = []
-                if not event.get("Event Description", "").strip():
-                    missing_fields.append("description")
-                if not event.get("Location", "").strip():
-                    missing_fields.append("location")
-                
-                if missing_fields:
-                    site_sync_status = "REVIEW NEEDED - MISSING INFO"
-                    status = "review needed"
-                else:
-                    status = "new"
-                    site_sync_status = existing_row[15] if link in existing_data else "new"
-
-                if link in existing_data:
-                    existing_vals = {
-                        "status": existing_row[2],
-                        "month": existing_row[6],
-                        "day": existing_row[7],
-                        "year": existing_row[8],
-                        "time": existing_row[3],
-                    }
-                    current_vals = {
-                        "status": event.get("Event Status", ""),
-                        "month": event.get("Month", ""),
-                        "day": event.get("Day", ""),
-                        "year": event.get("Year", ""),
-                        "time": event.get("Time", "")
-                    }
-                    changed_to_cancelled = (
-                        existing_vals["status"].lower() != current_vals["status"].lower()
-                        and current_vals["status"].lower() == "cancelled"
-                    )
-                    date_changed = (
-                        existing_vals["month"] != current_vals["month"]
-                        or existing_vals["day"] != current_vals["day"]
-                        or existing_vals["year"] != current_vals["year"]
-                    )
-                    time_changed = existing_vals["time"] != current_vals["time"]
-                    if changed_to_cancelled or date_changed or time_changed:
-                        status = "updates needed"
-                        if site_sync_status == "on site":
-                            site_sync_status = "updates needed"
-                    else:
-                        status = existing_row[14]
-                        site_sync_status = site_sync_status or ""
-
-                full_row = new_core + [now, status, site_sync_status]
-
-                if link not in existing_data:
-                    print("🔍 New row to append:", full_row)
-                    new_rows.append(full_row)
-                    added += 1
-    
-                elif new_core != existing_core:
-                    print(f"🔄 Updated row {link_to_row_index[link]}:", full_row)
-                    row_index = link_to_row_index[link]
-                    update_requests.append({
-                        "range": f"A{row_index}:Q{row_index}",
-                        "values": [full_row]
-                    })
-                    updated += 1
-            except Exception as row_err:
-                print(f"❌ Error processing event: {event.get('Event Name')} — {event.get('Event Link')}")
-                traceback.print_exc()
-                skipped += 1
-
-        if update_requests:
-            sheet.batch_update(update_requests)
-
-        # Export REVIEW NEEDED rows to CSV
-        review_rows = [r for r in new_rows if "REVIEW NEEDED" in r[-1]]
-        if review_rows:
-            review_df = pd.DataFrame(review_rows, columns=headers[:len(review_rows[0])])
-            review_path = f"Review Needed - Missing Info - {library}.csv"
-            review_df.to_csv(review_path, index=False)
-            print(f"📎 Exported {len(review_rows)} flagged rows to {review_path}")
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "25"))
+STREAM_FLUSH_SECONDS = float(os.environ.get("STREAM_FLUSH_SECONDS", "30"))
+_STREAM_DONE = object()
+
 
-            send_notification_email_with_attachment(
-            review_path,
-            f"{library.upper()} — Review Needed: Missing Info",
-            config["email_recipient"]
-           )
+def stream_events_to_sheet(events, library="vbpl", batch_size=STREAM_BATCH_SIZE, flush_seconds=STREAM_FLUSH_SECONDS,
+                           sheet=None, age_to_categories={}, name_suffix_map={}, on_uploaded=None):
+    """Upload events from an iterator in micro-batches while it is still producing.
 
+    A producer thread drains ``events`` (e.g. the scraper's generator) into a
+    queue; this thread diffs and writes a batch every ``batch_size`` events or
+    ``flush_seconds`` after the batch's first event, whichever comes first.
+    The sheet index is read once and kept current across batches; the review
+    CSV/email and the Log tab row are written once, after the last batch.
+    ``on_uploaded`` gets the links each batch confirmed on the sheet. Returns
+    the number of events consumed.
+    """
+    profile = get_library_profile(library).with_overrides(age_to_categories, name_suffix_map)
+    config = profile.config
+    if sheet is None:
+        sheet = connect_to_sheet(config["spreadsheet_name"], config["worksheet_name"])
+    sheet = mirrored(sheet, config["spreadsheet_name"], config["worksheet_name"])
 
-        if new_rows:
-            print("🔍 Full row to upload:", full_row)
-            sheet.append_rows(new_rows, value_input_option="USER_ENTERED")
+    incoming = Queue(maxsize=batch_size * 4)
+    producer_error = []
 
+    def _produce():
         try:
-            log_sheet = connect_to_sheet(SPREADSHEET_NAME, LOG_WORKSHEET_NAME)
-            log_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_row = [log_time, mode, added, updated, skipped]
-            log_sheet.append_row(log_row, value_input_option="USER_ENTERED")
-            print(f"📝 Logged summary to '{LOG_WORKSHEET_NAME}' tab.")
+            for event in events:
+                incoming.put(event)
         except Exception as e:
-            print(f"⚠️ Failed to log to {LOG_WORKSHEET_NAME} tab: {e}")
-
-        print(f"📦 {added} new events added.")
-        print(f"🔁 {updated} existing events updated.")
-        if skipped:
-            print(f"🧹 {skipped} malformed events skipped.")
-
-    except Exception as e:
-        print(f"❌ ERROR during upload_events_to_sheet: {e}")
-        traceback.print_exc()
+            producer_error.append(e)
+            traceback.print_exc()
+        finally:
+            incoming.put(_STREAM_DONE)
+
+    producer = threading.Thread(target=_produce, name="stream-producer", daemon=True)
+    producer.start()
+
+    batch = []
+    batch_started = None
+    total = 0
+    flushes = 0
+    index = None
+    headers = []
+    stats = UploadStats()
+
+    def _flush():
+        nonlocal batch, batch_started, flushes, index, headers
+        if not batch:
+            return
+        flushes += 1
+        print(f"🚿 Flushing batch {flushes} ({len(batch)} events)")
+        confirmed = []
+        try:
+            with span("upload.stream_flush", library=library, events=len(batch)):
+                if index is None or index.stale:
+                    index = _open_upload(sheet, library)
+                    headers = index.headers
+                confirmed = _upload_batch(batch, sheet, index, profile, library, stats)
+        except Exception as e:
+            print(f"❌ ERROR during stream batch {flushes}: {e}")
+            traceback.print_exc()
+            index = None
+        if on_uploaded is not None:
+            on_uploaded(confirmed)
+        batch = []
+        batch_started = None
+
+    while True:
+        timeout = None
+        if batch_started is not None:
+            timeout = max(0.0, batch_started + flush_seconds - time.monotonic())
+        try:
+            event = incoming.get(timeout=timeout)
+        except Empty:
+            _flush()
+            continue
+        if event is _STREAM_DONE:
+            break
+        batch.append(event)
+        total += 1
+        if batch_started is None:
+            batch_started = time.monotonic()
+        if len(batch) >= batch_size:
+            _flush()
+
+    _flush()
+    producer.join()
+    if flushes:
+        _finish_upload(profile, library, "stream", headers, stats)
+    count("upload.stream_events", total, library=library)
+    print(f"🚿 Streamed {total} events in {flushes} batches")
+    if producer_error:
+        print(f"⚠️ Event stream stopped early → {producer_error[0]}")
+    return total
@@ -0,0 +1,237 @@
+# work_leases.py — lease-based work distribution for running several scraper containers
+#
+# Every worker seeds the same listing URLs into a shared SQLite file, then
+# claims one listing at a time. A claim is a lease that expires after
+# LEASE_SECONDS unless the worker keeps renewing it: a LeaseHeartbeat thread
+# renews it every third of that for as long as the listing is being scraped
+# (harvest, fast path and all), so only listings held by a worker that died go
+# back to the pool. A worker with nothing left to claim keeps waiting while
+# other leases are live, so it is still there to reclaim a listing whose
+# worker died once that lease expires. Parsed events are written to the same
+# database keyed by link and merged into a single upload once every listing
+# is done.
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from checkpoint import CHECKPOINT_WINDOW
+
+LEASE_DB_PATH = os.environ.get("LEASE_DB_PATH", "work_leases.sqlite3")
+LEASE_SECONDS = int(os.environ.get("LEASE_SECONDS", "300"))
+LEASE_MAX_ATTEMPTS = int(os.environ.get("LEASE_MAX_ATTEMPTS", "3"))
+# How often an idle worker re-checks listings other workers still hold
+LEASE_POLL_SECONDS = float(os.environ.get("LEASE_POLL_SECONDS", "15"))
+SHARD_WORKER_ID = os.environ.get("SHARD_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    run TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run, url)
+);
+CREATE TABLE IF NOT EXISTS events (
+    run TEXT NOT NULL,
+    link TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (run, link)
+);
+"""
+
+
+class LeaseHeartbeat:
+    """Keep renewing one lease from a background thread until the block exits."""
+
+    def __init__(self, store, url, interval=None):
+        self.store = store
+        self.url = url
+        self.interval = interval or max(1.0, store.lease_seconds / 3)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                renewed = self.store.renew(self.url)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not renew lease on {self.url} → {e}")
+                continue
+            if not renewed:
+                self.lost = True
+                print(f"⚠️ Lease on {self.url} was taken over by another worker")
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class LeaseStore:
+    def __init__(self, path=LEASE_DB_PATH, run=CHECKPOINT_WINDOW, worker_id=SHARD_WORKER_ID,
+                 lease_seconds=LEASE_SECONDS, max_attempts=LEASE_MAX_ATTEMPTS):
+        self.path = path
+        self.run = run
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps this safe to call from
+        # the scraper's worker threads; BEGIN IMMEDIATE serialises claims.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def seed(self, urls):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO listings (run, url) VALUES (?, ?)",
+                [(self.run, url) for url in urls],
+            )
+
+    def claim(self):
+        """Lease the next pending (or abandoned) listing to this worker; None when nothing is left."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                """SELECT url, status, worker FROM listings
+                   WHERE run = ? AND attempts < ?
+                     AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                   ORDER BY attempts, url LIMIT 1""",
+                (self.run, self.max_attempts, now),
+            ).fetchone()
+            if row is None:
+                return None
+            url, status, previous = row
+            conn.execute(
+                """UPDATE listings SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1
+                   WHERE run = ? AND url = ?""",
+                (self.worker_id, now + self.lease_seconds, self.run, url),
+            )
+        if status == "leased":
+            print(f"♻️ Reclaimed {url} from expired lease held by {previous}")
+        return url
+
+    def next_expiry(self):
+        """Earliest expiry among leases that could still be reclaimed; None if there are none."""
+        with self._connect() as conn:
+            (expires,) = conn.execute(
+                "SELECT MIN(lease_expires) FROM listings WHERE run = ? AND status = 'leased' AND attempts < ?",
+                (self.run, self.max_attempts),
+            ).fetchone()
+        return expires
+
+    def claim_next(self, poll_seconds=LEASE_POLL_SECONDS):
+        """Claim a listing, waiting out other workers' live leases; None once the run is finished."""
+        while True:
+            url = self.claim()
+            if url is not None or self.is_finished():
+                return url
+            expires = self.next_expiry()
+            wait = poll_seconds if expires is None else min(poll_seconds, max(1.0, expires - time.time()))
+            time.sleep(wait)
+
+    def renew(self, url):
+        """Extend our lease; False if another worker has taken the listing over."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                """UPDATE listings SET lease_expires = ?
+                   WHERE run = ? AND url = ? AND worker = ? AND status = 'leased'""",
+                (time.time() + self.lease_seconds, self.run, url, self.worker_id),
+            )
+            return cur.rowcount == 1
+
+    def heartbeat(self, url, interval=None):
+        """``with store.heartbeat(url):`` holds the lease for as long as the block runs."""
+        return LeaseHeartbeat(self, url, interval)
+
+    def record_event(self, url, event):
+        """Store one parsed event (first writer wins per link) and renew the listing lease."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO events (run, link, listing, worker, payload) VALUES (?, ?, ?, ?, ?)",
+                (self.run, event["link"], url, self.worker_id, json.dumps(event, ensure_ascii=False)),
+            )
+            conn.execute(
+                "UPDATE listings SET lease_expires = ? WHERE run = ? AND url = ? AND worker = ?",
+                (time.time() + self.lease_seconds, self.run, url, self.worker_id),
+            )
+
+    def complete(self, url):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE listings SET status = 'done', lease_expires = 0 WHERE run = ? AND url = ? AND worker = ?",
+                (self.run, url, self.worker_id),
+            )
+
+    def release(self, url):
+        """Hand a listing back after a failure so another worker (or a later claim) can retry it."""
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE listings SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                       worker = NULL, lease_expires = 0
+                   WHERE run = ? AND url = ? AND worker = ?""",
+                (self.max_attempts, self.run, url, self.worker_id),
+            )
+
+    def progress(self):
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT CASE WHEN status = 'leased' AND lease_expires < ? AND attempts >= ? THEN 'failed'
+                                WHEN status = 'leased' AND lease_expires < ? THEN 'expired'
+                                ELSE status END, COUNT(*)
+                   FROM listings WHERE run = ? GROUP BY 1""",
+                (now, self.max_attempts, now, self.run),
+            ).fetchall()
+        return dict(rows)
+
+    def is_finished(self):
+        """True once no listing is pending or held by a live lease."""
+        progress = self.progress()
+        return not progress.get("pending") and not progress.get("leased") and not progress.get("expired")
+
+    def wait_until_finished(self, poll_seconds=15, timeout=None):
+        started = time.monotonic()
+        while not self.is_finished():
+            if timeout is not None and time.monotonic() - started > timeout:
+                print(f"⚠️ Gave up waiting for shards: {self.progress()}")
+                return False
+            time.sleep(poll_seconds)
+        return True
+
+    def merged_events(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM events WHERE run = ? ORDER BY listing, link", (self.run,)
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]